@@ -0,0 +1,470 @@
+"""Headless benchmarks for the rendering and export hot paths.
+
+Covers single-label rendering (payload length, target size unit, font,
+logo width), the QR encoding profiles, the CLI's ``generate_qr_codes`` and
+ZIP export of 100, 1k and 10k labels.  Each case reports labels/s, per-label latency percentiles and
+peak memory; results can be saved as JSON and compared between runs:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+
+from qrGenerator import generate_qr_codes
+from qr_archive import export_archive
+from qr_cache import RenderCache
+from qr_export import DEFAULT_WORKERS
+from qr_pipeline import PIPELINE_MEMORY, ExportPipeline
+from qr_profile import NULL_PROFILE
+from qr_render import ENCODING_PROFILES, FONT_MAP, LabelRenderer, LabelSettings, target_pixels
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Payload lengths from short IDs up to URLs close to version-40 capacity
+PAYLOAD_LENGTHS = {
+    "short_id": 8,
+    "asset_tag": 24,
+    "url": 96,
+    "long_url": 384,
+    "near_capacity": 2000,
+}
+TARGET_SIZES = {
+    "cm": (10, 5, "cm"),
+    "in": (4, 2, "in"),
+    "px": (600, 300, "px"),
+}
+LOGO_WIDTHS = (100, 400, 1000)
+EXPORT_SIZES = (100, 1000, 10000)
+QUICK_EXPORT_SIZES = (100, 1000)
+RENDER_REPEATS = 30
+MEMORY_SAMPLE = 10           # labels rendered under tracemalloc per case
+REGRESSION_THRESHOLD = 0.10  # flag cases more than 10% slower in --compare
+DECODE_SAMPLE = 20           # labels per encoding case checked with a decoder
+SUITES = ["render", "encoding", "cli", "export"]
+
+
+def make_payload(length, index=0):
+    """Build a URL-like payload of exactly *length* characters."""
+    base = f"https://assets.example.com/tag/{index:06d}?loc="
+    if length <= len(base):
+        return f"A{index:0{length - 1}d}"[:length] if length > 1 else "A"
+    filler = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    body = (filler * (length // len(filler) + 1))[:length - len(base)]
+    return base + body
+
+
+def package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, if the OS reports it."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def traced_peak_mb(fn):
+    """Peak Python-heap allocation (MB) while running *fn*."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(name, latencies, elapsed, peak_mb, **extra):
+    count = len(latencies)
+    result = {
+        "name": name,
+        "labels": count,
+        "seconds": round(elapsed, 4),
+        "labels_per_sec": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p90": round(percentile(latencies, 90) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+        },
+        "peak_traced_mb": round(peak_mb, 2),
+        "max_rss_mb": round(max_rss_mb(), 1) if resource is not None else None,
+    }
+    result.update(extra)
+    return result
+
+
+def bench_render(name, settings, text_len, target, repeats):
+    """Time LabelRenderer.render on distinct payloads of one length."""
+    renderer = LabelRenderer(settings)
+    target_w, target_h = target
+    texts = [make_payload(text_len, i) for i in range(repeats)]
+    renderer.render(texts[0], target_w, target_h)  # warm the asset cache
+
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        renderer.render(text, target_w, target_h)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    peak = traced_peak_mb(
+        lambda: [renderer.render(t, target_w, target_h) for t in texts[:MEMORY_SAMPLE]]
+    )
+    return summarize(name, latencies, elapsed, peak,
+                     payload_len=text_len, target_px=[target_w, target_h])
+
+
+def find_decoder():
+    """Return (name, decode) for an installed QR decoder, or (None, None).
+
+    ``decode(img)`` returns the list of payloads found in a PIL image.
+    Decoders are optional, but benchmarking a non-standard encoding
+    profile without one needs ``--no-decode``.
+    """
+    try:
+        import zxingcpp
+        return "zxing-cpp", lambda img: [r.text for r in zxingcpp.read_barcodes(img)]
+    except ImportError:
+        pass
+    try:
+        from pyzbar import pyzbar
+        return "pyzbar", lambda img: [r.data.decode("utf-8") for r in pyzbar.decode(img)]
+    except ImportError:
+        pass
+    try:
+        import cv2
+        import numpy as np
+        detector = cv2.QRCodeDetector()
+
+        def decode(img):
+            text = detector.detectAndDecode(np.asarray(img.convert("L")))[0]
+            return [text] if text else []
+        return "opencv", decode
+    except ImportError:
+        return None, None
+
+
+def decode_check(settings, text_len, target, count=DECODE_SAMPLE):
+    """Render *count* labels and report how many decode back to their payload."""
+    name, decode = find_decoder()
+    if decode is None:
+        return {"decoder": None, "checked": 0, "decoded": 0}
+    renderer = LabelRenderer(settings)
+    texts = [make_payload(text_len, i) for i in range(count)]
+    decoded = sum(text in decode(renderer.render(text, *target)) for text in texts)
+    return {"decoder": name, "checked": count, "decoded": decoded}
+
+
+def bench_encoding(encoding, label, text_len, target, repeats, decode=True):
+    """Time label rendering with one encoding profile and check decodability.
+
+    Without *decode* the check is skipped and ``result["decode"]`` is None.
+    """
+    settings = LabelSettings(encoding=encoding)
+    result = bench_render(f"encoding_{encoding}_{label}", settings, text_len, target, repeats)
+    result["encoding"] = encoding
+    result["decode"] = decode_check(settings, text_len, target) if decode else None
+    return result
+
+
+def encoding_speedups(results):
+    """Yield (payload label, speedup) of each non-standard profile over standard."""
+    by_name = {case["name"]: case for case in results}
+    for case in results:
+        encoding = case.get("encoding")
+        if encoding in (None, "standard"):
+            continue
+        label = case["name"][len(f"encoding_{encoding}_"):]
+        base = by_name.get(f"encoding_standard_{label}")
+        if base and base["labels_per_sec"]:
+            yield f"{encoding}_{label}", case["labels_per_sec"] / base["labels_per_sec"]
+
+
+class _TimedPayloads(list):
+    """Payloads that record when each one is first read.
+
+    The pipeline's read thread takes payloads as it admits them, so this
+    is when a label enters the export.
+    """
+
+    def __init__(self, texts):
+        super().__init__(texts)
+        self.read = [None] * len(self)
+
+    def __iter__(self):
+        for i, text in enumerate(super().__iter__()):
+            if self.read[i] is None:
+                self.read[i] = time.perf_counter()
+            yield text
+
+
+class _LabelClock:
+    """Timestamps every finished label.
+
+    Used as the progress callback of exports, and as a (disabled) profile
+    for the CLI, whose ``add_labels`` is called once per file written.
+    """
+
+    enabled = False
+    labels = 0
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.times = []
+
+    def tick(self, *args):
+        self.times.append(time.perf_counter())
+
+    add_labels = tick
+
+    def stage(self, name):
+        return NULL_PROFILE.stage(name)
+
+    def add(self, name, seconds, count=1):
+        pass
+
+    def merge(self, snapshot):
+        pass
+
+    def latencies(self, payloads):
+        """Seconds from reading each of *payloads* (``_TimedPayloads``) to finishing it.
+
+        Labels finish in input order, so the i-th tick belongs to the i-th
+        payload.
+        """
+        return [done - read for read, done in zip(payloads.read, self.times)]
+
+
+def bench_cli(count, workers):
+    """Time the CLI's generate_qr_codes writing bare codes to a temp dir."""
+    texts = _TimedPayloads(make_payload(PAYLOAD_LENGTHS["asset_tag"], i) for i in range(count))
+    with tempfile.TemporaryDirectory() as out_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            clock = _LabelClock()
+            generate_qr_codes(texts, output_dir=out_dir, workers=workers,
+                              progress_interval=float("inf"), profile=clock)
+            elapsed = time.perf_counter() - clock.start
+            peak = traced_peak_mb(
+                lambda: generate_qr_codes(texts[:MEMORY_SAMPLE], output_dir=out_dir,
+                                          progress_interval=float("inf"))
+            )
+    return summarize(f"cli_generate_{count}", clock.latencies(texts), elapsed, peak,
+                     workers=workers)
+
+
+def export_zip(texts, settings, target_w, target_h, zip_path, fmt="PNG", workers=1,
+               cache=None, progress=None):
+    """Export *texts* to *zip_path* with the options the GUI export uses."""
+    return export_archive(
+        zip_path, texts, settings, target_w, target_h, fmt, workers=workers, cache=cache,
+        progress=progress, checkpoint=True, pipeline=ExportPipeline(PIPELINE_MEMORY),
+    )
+
+
+def bench_export(count, workers, settings=None, cache_dir=None):
+    """Time a full ZIP export of *count* 4x2in labels.
+
+    With *cache_dir*, labels go through a ``RenderCache`` there, as with
+    the GUI's "Use render cache".
+    """
+    settings = settings or LabelSettings()
+    target_w, target_h = target_pixels(4, 2, "in")
+    texts = _TimedPayloads(make_payload(PAYLOAD_LENGTHS["asset_tag"], i) for i in range(count))
+    cache = RenderCache(cache_dir) if cache_dir else None
+    with tempfile.TemporaryDirectory() as out_dir:
+        zip_path = os.path.join(out_dir, "export.zip")
+        clock = _LabelClock()
+        export_zip(texts, settings, target_w, target_h, zip_path, workers=workers,
+                   cache=cache, progress=clock.tick)
+        elapsed = time.perf_counter() - clock.start
+        archive_bytes = os.path.getsize(zip_path)
+        peak = traced_peak_mb(
+            lambda: export_zip(texts[:MEMORY_SAMPLE], settings, target_w, target_h,
+                               os.path.join(out_dir, "sample.zip"))
+        )
+    return summarize(f"export_zip_{count}", clock.latencies(texts), elapsed, peak,
+                     workers=workers, archive_bytes=archive_bytes,
+                     bytes_per_label=round(archive_bytes / count, 1))
+
+
+def iter_cases(args):
+    """Yield (name, callable) for every selected benchmark case."""
+    default_target = target_pixels(4, 2, "in")
+    repeats = args.repeats
+
+    if "render" in args.suites:
+        for label, length in PAYLOAD_LENGTHS.items():
+            yield (f"render_payload_{label}",
+                   lambda length=length: bench_render(
+                       f"render_payload_{label}", LabelSettings(), length,
+                       default_target, repeats))
+        for unit, (w, h, u) in TARGET_SIZES.items():
+            yield (f"render_target_{unit}",
+                   lambda w=w, h=h, u=u, unit=unit: bench_render(
+                       f"render_target_{unit}", LabelSettings(),
+                       PAYLOAD_LENGTHS["asset_tag"], target_pixels(w, h, u), repeats))
+        for font in FONT_MAP:
+            slug = font.lower().replace(" ", "_")
+            yield (f"render_font_{slug}",
+                   lambda font=font, slug=slug: bench_render(
+                       f"render_font_{slug}", LabelSettings(font=font),
+                       PAYLOAD_LENGTHS["asset_tag"], default_target, repeats))
+        for width in LOGO_WIDTHS:
+            yield (f"render_logo_{width}",
+                   lambda width=width: bench_render(
+                       f"render_logo_{width}", LabelSettings(logo_size=width),
+                       PAYLOAD_LENGTHS["asset_tag"], default_target, repeats))
+
+    if "encoding" in args.suites:
+        for label, length in PAYLOAD_LENGTHS.items():
+            for encoding in ENCODING_PROFILES:
+                yield (f"encoding_{encoding}_{label}",
+                       lambda encoding=encoding, label=label, length=length: bench_encoding(
+                           encoding, label, length, default_target, repeats,
+                           decode=not args.no_decode))
+
+    if "cli" in args.suites:
+        for count in args.export_sizes:
+            yield f"cli_generate_{count}", lambda count=count: bench_cli(count, args.workers)
+
+    if "export" in args.suites:
+        for count in args.export_sizes:
+            yield (f"export_zip_{count}",
+                   lambda count=count: bench_export(count, args.workers, cache_dir=args.cache))
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print throughput changes against a previous JSON run.
+
+    Returns the number of cases that got slower by more than *threshold*.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {case["name"]: case for case in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path}:")
+    for case in results:
+        old = baseline.get(case["name"])
+        if not old or not old["labels_per_sec"]:
+            continue
+        change = case["labels_per_sec"] / old["labels_per_sec"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"  {case['name']:<32} {old['labels_per_sec']:>9.1f} -> "
+              f"{case['labels_per_sec']:>9.1f} labels/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", nargs="+", default=SUITES, choices=SUITES)
+    parser.add_argument("--quick", action="store_true",
+                        help=f"export only {QUICK_EXPORT_SIZES} labels")
+    parser.add_argument("--export-sizes", type=int, nargs="+",
+                        help=f"label counts for the CLI/export suites (default: {EXPORT_SIZES})")
+    parser.add_argument("--repeats", type=int, default=RENDER_REPEATS,
+                        help="labels per render case")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help=f"worker processes for CLI/export (this machine: {DEFAULT_WORKERS})")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="export through a render cache in DIR (warm it with a first run)")
+    parser.add_argument("--no-decode", action="store_true",
+                        help="skip checking that encoding-suite labels still decode")
+    parser.add_argument("-k", "--filter", help="only run cases whose name contains this")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="compare against a previous run")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown fraction reported as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+    if args.export_sizes is None:
+        args.export_sizes = QUICK_EXPORT_SIZES if args.quick else EXPORT_SIZES
+    if not args.no_decode and find_decoder()[0] is None and any(
+        name.startswith("encoding_") and not name.startswith("encoding_standard_")
+        and (not args.filter or args.filter in name)
+        for name, _ in iter_cases(args)
+    ):
+        parser.error("no QR decoder installed (zxing-cpp, pyzbar or opencv-python) to check "
+                     "that non-standard encoding profiles still decode; install one or pass "
+                     "--no-decode")
+
+    results = []
+    for name, run in iter_cases(args):
+        if args.filter and args.filter not in name:
+            continue
+        result = run()
+        results.append(result)
+        lat = result["latency_ms"]
+        print(f"{name:<32} {result['labels_per_sec']:>9.1f} labels/s  "
+              f"p50 {lat['p50']:>8.2f} ms  p99 {lat['p99']:>8.2f} ms  "
+              f"peak {result['peak_traced_mb']:>6.1f} MB", flush=True)
+        if "decode" in result:
+            check = result["decode"]
+            if check is None:
+                print(f"{'':<32} decode check skipped (--no-decode)")
+            elif check["decoder"] is None:
+                print(f"{'':<32} decode check skipped: no decoder installed")
+            else:
+                print(f"{'':<32} decoded {check['decoded']}/{check['checked']} "
+                      f"with {check['decoder']}")
+
+    speedups = list(encoding_speedups(results))
+    if speedups:
+        print("\nEncoding speedup over standard:")
+        for name, speedup in speedups:
+            print(f"  {name:<32} {speedup:>6.2f}x")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pillow": package_version("pillow"),
+            "qrcode": package_version("qrcode"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,399 @@
-import qrcode
+import argparse
+import csv
 import sys
 import os
+import shutil
+import time
+from collections import Counter
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, Optional
+
+from qr_archive import entry_name
+from qr_cache import CACHE_DIR, CACHE_MAX_BYTES, RenderCache, settings_digest
+from qr_checkpoint import Checkpointer, add_payload, payload_hash, read_checkpoint
+from qr_export import FORMAT_EXTENSIONS, dedup_summary, iter_deduplicated, version_summary
+from qr_pipeline import PIPELINE_MEMORY, ExportPipeline
+from qr_profile import NULL_PROFILE, Profile
+from qr_render import (
+    COLOR_MODES, ENCODING_PROFILES, FONT_MAP, SEGMENT_MODES, LabelSettings, target_pixels,
+)
+from qr_shard import (
+    ShardManifest, global_index, parse_shard, shard_payloads,
+)
 
 OUTPUT_DIR = "sources"
+PROGRESS_INTERVAL = 5.0  # seconds between throughput summaries
+CHECKPOINT_NAME = "qr_checkpoint.json"
+
+
+def read_lines(f) -> Iterator[str]:
+    """Yield non-empty, stripped lines from a text stream, one at a time."""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def read_csv_column(f, column: str) -> Iterator[str]:
+    """Yield the non-empty values of one CSV column.
+
+    *column* is either a header name or a 1-based column number (in which
+    case the file is assumed to have no header row).
+    """
+    if column.isdigit():
+        index = int(column) - 1
+        for row in csv.reader(f):
+            if index < len(row) and row[index].strip():
+                yield row[index].strip()
+    else:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or column not in reader.fieldnames:
+            raise ValueError(f"CSV column {column!r} not found")
+        for row in reader:
+            value = (row[column] or "").strip()
+            if value:
+                yield value
+
+
+def iter_payloads(path: str, csv_column: Optional[str] = None) -> Iterator[str]:
+    """Lazily read payloads from a text file, a CSV column, or stdin ('-')."""
+    if path == "-":
+        f = sys.stdin
+    else:
+        f = open(path, "r", encoding="utf-8", newline="")
+    try:
+        if csv_column:
+            yield from read_csv_column(f, csv_column)
+        else:
+            yield from read_lines(f)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
 
+def resume_point(strings: Iterable[str], checkpoint: str, output_dir: str,
+                 name: Callable[[int], str], digest: str, limit: Optional[int] = None):
+    """Where an interrupted run into *output_dir* continues.
 
-def generate_qr_codes(strings: list[str]) -> None:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    Checks that *strings* starts with the payloads the checkpoint lists
+    as completed and finds the first of them whose file (``name(i)``
+    for the i-th payload) is missing or empty; at most *limit* are kept
+    if given.  Returns (labels done, running payload hash up to there,
+    remaining payloads).  Raises ``ValueError`` if there is nothing to
+    resume or the batch or settings differ.
+    """
+    state = read_checkpoint(checkpoint)
+    if state is None:
+        raise ValueError(f"no interrupted run to resume in {output_dir}")
+    if state["digest"] != digest:
+        raise ValueError("the label settings or format differ from the interrupted run")
+    completed = state["completed"]
+    done = 0
+    while done < (completed if limit is None else min(completed, limit)):
+        path = os.path.join(output_dir, name(done))
+        if not os.path.isfile(path) or not os.path.getsize(path):
+            break
+        done += 1
 
-    for i, text in enumerate(strings):
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
+    strings = iter(strings)
+    hasher = payload_hash()
+    prefix = None
+    redo = []  # completed payloads whose files have to be written again
+    for i, text in enumerate(islice(strings, completed)):
+        if i == done:
+            prefix = hasher.copy()
+        if i >= done:
+            redo.append(text)
+        add_payload(hasher, text)
+    if len(redo) != completed - done or hasher.hexdigest() != state["payloads"]:
+        raise ValueError("the payloads differ from the interrupted run")
+    return done, prefix or hasher, chain(redo, strings)
+
+
+def generate_qr_codes(
+    strings: Iterable[str],
+    output_dir: str = OUTPUT_DIR,
+    workers: int = 1,
+    settings: Optional[LabelSettings] = None,
+    target: Optional[tuple[int, int]] = None,
+    progress_interval: float = PROGRESS_INTERVAL,
+    cache: Optional[RenderCache] = None,
+    fmt: str = "PNG",
+    profile: Optional[Profile] = None,
+    resume: bool = False,
+    memory: int = PIPELINE_MEMORY,
+    shard: Optional[tuple[int, int]] = None,
+) -> int:
+    """Render every payload in *strings* and write it as it is produced.
+
+    *strings* may be any (lazy) iterable; only a bounded number of codes is
+    in memory at once.  Without a *target* size the bare QR code is written,
+    otherwise a full label at (width_px, height_px).  Returns the number of
+    codes written.  With a *cache*, previously rendered codes are served
+    from disk.  *fmt* is any of ``FORMAT_EXTENSIONS`` (SVG and PDF are
+    written as vectors).  Per-stage timings go to *profile* if given.  The
+    QR versions of the rendered codes are printed with the summary.
+    Repeated payloads are rendered once; their later files are copies of
+    the first.  Codes go through an ``ExportPipeline`` that keeps at most
+    *memory* bytes of labels in flight; its queue depths are printed with
+    the throughput.
+
+    Progress is checkpointed to ``CHECKPOINT_NAME`` in *output_dir* while
+    the batch runs.  With *resume*, an interrupted run of the same batch
+    and settings continues from the first code it did not finish (see
+    ``resume_point``); the count returned includes the codes kept.
+
+    With *shard* = (k, n) only every n-th payload, starting with the k-th,
+    is rendered (see ``qr_shard``); files are named by their position in
+    the whole input, and each payload is journaled for the shard manifest
+    (``ShardManifest``) as its file is written.
+    """
+    profile = profile or NULL_PROFILE
+    settings = settings or LabelSettings()
+    os.makedirs(output_dir, exist_ok=True)
+    target_w, target_h = target or (None, None)
+    ext = FORMAT_EXTENSIONS[fmt][0]
+    digest = settings_digest(settings, target_w, target_h, fmt)
+
+    manifest = None
+    if shard is None:
+        name = lambda local: f"qr_{local + 1}{ext}"
+        checkpoint = os.path.join(output_dir, CHECKPOINT_NAME)
+    else:
+        k, n = shard
+        name = lambda local: entry_name(global_index(local, k, n), ext)
+        checkpoint = os.path.join(output_dir, f"qr_checkpoint_{k}of{n}.json")
+        manifest = ShardManifest(output_dir, shard, digest, fmt)
+        strings = shard_payloads(strings, k, n)
+
+    done, hasher = 0, None
+    if resume:
+        done, hasher, strings = resume_point(
+            strings, checkpoint, output_dir, name, digest,
+            limit=manifest.recorded() if manifest is not None else None,
         )
-        qr.add_data(text)
-        qr.make(fit=True)
+        print(f"Resuming after {done} codes already written")
+    if manifest is not None:
+        manifest.open(keep=done)
+    checkpointer = Checkpointer(checkpoint, {"digest": digest, "format": fmt},
+                                completed=done, hasher=hasher)
+    checkpointer.save()
 
-        img = qr.make_image(fill_color="black", back_color="white")
-        filename = f"qr_{i + 1}.png"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        img.save(filepath)
-        print(f"[{i + 1}/{len(strings)}] Saved: {filepath}  ->  {text!r}")
+    start = last_report = time.perf_counter()
+    count = done
+    total_bytes = unique = 0
+    versions = Counter()
+    pipeline = ExportPipeline(memory)
+    encoded = iter_deduplicated(strings, lambda distinct: pipeline.run(
+        distinct, settings, target_w, target_h, fmt,
+        workers=workers, cache=cache, profile=profile, versions=versions
+    ))
+    try:
+        for count, (text, data, first) in enumerate(encoded, start=done + 1):
+            filepath = os.path.join(output_dir, name(count - 1))
+            if data is None:
+                with profile.stage("file_copy"):
+                    source = os.path.join(output_dir, name(done + first))
+                    shutil.copyfile(source, filepath)
+                total_bytes += os.path.getsize(filepath)
+            else:
+                with profile.stage("file_write"):
+                    with open(filepath, "wb") as f:
+                        f.write(data)
+                total_bytes += len(data)
+                unique += 1
+            if manifest is not None:
+                manifest.add(text)
+            checkpointer.advance(text)
+            profile.add_labels()
 
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                print(f"{count} codes written, {(count - done) / (now - start):.1f} codes/s "
+                      f"({pipeline.depth_summary()})")
+    except BaseException:
+        if manifest is not None:
+            manifest.close()
+        checkpointer.save()
+        print(f"Stopped after {checkpointer.completed} codes; run again with --resume "
+              f"to continue", file=sys.stderr)
+        raise
+    if manifest is not None:
+        manifest.finish()
+    checkpointer.remove()
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python qrGenerator.py <string1> <string2> ...")
-        sys.exit(1)
+    written = count - done
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    per_code = total_bytes / written if written else 0
+    print(
+        f"Done: {written} codes in {elapsed:.1f}s ({rate:.1f} codes/s, "
+        f"{per_code / 1024:.1f} KB/code) -> {output_dir}"
+        + (f" ({done} kept from the interrupted run)" if done else "")
+    )
+    if unique < written:
+        print(f"Duplicates: {dedup_summary(written, unique)}")
+    if versions:
+        cached = unique - sum(versions.values())
+        print(f"QR versions: {version_summary(versions)}"
+              + (f" ({cached} from cache)" if cached else ""))
+    return count
 
-    generate_qr_codes(sys.argv[1:])
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Batch QR code generator. Payloads come from the command "
+                    "line or, for large batches, are streamed from a file or stdin."
+    )
+    parser.add_argument("strings", nargs="*", help="strings to encode")
+    parser.add_argument("-i", "--input", metavar="FILE",
+                        help="read payloads from FILE, one per line ('-' for stdin)")
+    parser.add_argument("--csv-column", metavar="COLUMN",
+                        help="treat the input as CSV and read this column "
+                             "(header name or 1-based number)")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR,
+                        help=f"output directory (default: {OUTPUT_DIR})")
+    parser.add_argument("-f", "--format", type=str.upper, default="PNG",
+                        choices=list(FORMAT_EXTENSIONS),
+                        help="output format; SVG and PDF are vector output (default: PNG)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="worker processes used for rendering (default: 1)")
+    parser.add_argument("--segments", choices=SEGMENT_MODES, default="optimal",
+                        help="optimal numeric/alphanumeric/byte split for the smallest "
+                             "QR version; uppercase also upper-cases payloads (only for "
+                             "case-insensitive data); qrcode keeps the library's split "
+                             "(default: optimal)")
+    parser.add_argument("--encoding", choices=list(ENCODING_PROFILES), default="standard",
+                        help="standard scores all 8 QR masks per code; fast uses a fixed "
+                             "mask for higher throughput (default: standard)")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-stage timings (encode, compose, write, ...) to JSON")
+    parser.add_argument("--memory", type=int, default=PIPELINE_MEMORY // 2**20, metavar="MB",
+                        help="peak-memory target for labels in flight between the read, "
+                             "encode, compose, image-encode and write stages "
+                             f"(default: {PIPELINE_MEMORY // 2**20})")
+    parser.add_argument("--shard", metavar="K/N",
+                        help="render only shard K of N (every N-th payload, starting with "
+                             "the K-th) with global file numbers; combine the shards with "
+                             "qr_shard.py")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run into the output directory; the "
+                             "payloads and options must be the same")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between throughput summaries")
+
+    cache = parser.add_argument_group("render cache")
+    cache.add_argument("--cache-dir", metavar="DIR",
+                       help=f"serve repeat renders from an on-disk cache (e.g. {CACHE_DIR})")
+    cache.add_argument("--cache-size", type=int, default=CACHE_MAX_BYTES // 2**20,
+                       metavar="MB", help="cache size limit in MB")
+    cache.add_argument("--cache-stats", action="store_true",
+                       help="print cache statistics (alone: report and exit)")
+
+    label = parser.add_argument_group(
+        "label options", "render full labels (logo, QR code, caption) instead of bare codes"
+    )
+    label.add_argument("--width", type=float, help="label width")
+    label.add_argument("--height", type=float, help="label height")
+    label.add_argument("--unit", choices=["cm", "in", "px"], default="in",
+                       help="unit of --width/--height (default: in)")
+    label.add_argument("--colors", choices=list(COLOR_MODES), default="rgb",
+                       help="rgb, 1-bit mono or a 4-level gray palette (default: rgb)")
+    label.add_argument("--png-level", type=int, choices=range(10), default=6,
+                       metavar="0-9", help="PNG compress level (default: 6)")
+    label.add_argument("--font", choices=list(FONT_MAP), default="Arial")
+    label.add_argument("--text-size", type=int, default=35, help="caption font size in pt")
+    label.add_argument("--logo-width", type=int, default=400, help="logo width in px")
+    for element, default in (("logo", "left"), ("qr", "center"), ("text", "center")):
+        label.add_argument(f"--{element}-align", choices=["left", "center", "right"],
+                           default=default)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_dir or args.cache_stats:
+        cache = RenderCache(args.cache_dir or CACHE_DIR, args.cache_size * 2**20)
+
+    if args.strings and args.input:
+        parser.error("pass strings or --input, not both")
+    if not args.strings and not args.input:
+        if args.cache_stats:
+            print(cache.report())
+            return 0
+        parser.print_usage()
+        return 1
+    if args.csv_column and not args.input:
+        parser.error("--csv-column requires --input")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.memory < 1:
+        parser.error("--memory must be at least 1 MB")
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if (args.width is None) != (args.height is None):
+        parser.error("--width and --height must be given together")
+
+    target = None
+    if args.width is not None:
+        try:
+            target = target_pixels(args.width, args.height, args.unit)
+        except ValueError as e:
+            parser.error(str(e))
+
+    settings = LabelSettings(
+        logo_align=args.logo_align,
+        qr_align=args.qr_align,
+        text_align=args.text_align,
+        logo_size=args.logo_width,
+        text_size=args.text_size,
+        font=args.font,
+        color_mode=COLOR_MODES[args.colors],
+        png_compress_level=args.png_level,
+        encoding=args.encoding,
+        segments=args.segments,
+    )
+
+    profile = Profile() if args.profile else None
+
+    if args.input:
+        payloads = iter_payloads(args.input, args.csv_column)
+    else:
+        payloads = args.strings
+
+    try:
+        generate_qr_codes(
+            payloads,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            settings=settings,
+            target=target,
+            progress_interval=args.progress_interval,
+            cache=cache,
+            fmt=args.format,
+            profile=profile,
+            resume=args.resume,
+            memory=args.memory * 2**20,
+            shard=shard,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if profile is not None:
+        profile.dump(args.profile)
+        print(profile.summary())
+        print(f"Profile written to {args.profile}")
+    if args.cache_stats:
+        print(cache.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,755 @@
+"""ZIP exports with a manifest, for incremental re-export.
+
+Every export archive carries ``manifest.json``: for each entry, the
+payload and a key hashing the payload together with everything else that
+determines its bytes (settings, logo, size, format; see ``qr_cache``).
+When a previous archive is given, entries whose key it already contains
+are copied from it as raw compressed bytes (no decode, no recompression,
+even if their position changed) and only new or changed labels are
+rendered, so a refresh costs time roughly proportional to the diff.
+Repeats within one batch are rendered once and copied the same way from
+the entry already written.
+
+Labels are streamed into the archive one entry at a time (ZIP64 once it
+grows past the classic limits), and large exports can be split into
+numbered volumes by size or label count, each with its own manifest.
+
+With a checkpoint (see ``qr_checkpoint``), a cancelled, failed or
+crashed export keeps what it wrote, and ``resume_export`` continues it:
+entries are validated from their local headers (so an archive without a
+central directory is fine), the last volume is truncated after its last
+good entry and reopened, and rendering starts at the first missing label.
+"""
+import json
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+
+from qr_cache import cache_key, settings_digest
+from qr_export import FORMAT_EXTENSIONS, ZIP_COMPRESSION, dedup_summary
+from qr_checkpoint import Checkpointer, prefix_hash, read_checkpoint, verify_prefix
+from qr_pipeline import ExportPipeline
+from qr_profile import NULL_PROFILE
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+_DATA_DESCRIPTOR = 0x08  # flag bit: sizes/CRC follow the data instead of the header
+_VOLUME = re.compile(r"^(.*)_part\d{3}\.zip$")
+_KEPT = 1 << 62  # flag in ArchiveWriter._written: first entry kept from an interrupted run
+
+# copy_raw appends compressed bytes through ZipFile internals that are
+# unchanged from CPython 3.9 through 3.14; elsewhere entries are inflated
+# and recompressed through the public ZipFile.open instead
+_RAW_COPY = sys.implementation.name == "cpython" and sys.version_info < (3, 15)
+
+# Bytes an entry adds besides its data and name: local header, central
+# directory record and a ZIP64 extra field (offsets past 4 GiB)
+_ENTRY_OVERHEAD = zipfile.sizeFileHeader + zipfile.sizeCentralDir + 28
+_END_OVERHEAD = (
+    zipfile.sizeEndCentDir + zipfile.sizeEndCentDir64 + zipfile.sizeEndCentDir64Locator
+)
+
+
+def entry_name(index, ext):
+    """Archive name of the label at 0-based *index*."""
+    return f"qr_{index + 1:04d}{ext}"
+
+
+def _key_digest(key):
+    """Fixed-size form of a manifest key (a SHA-256 hex digest) for in-memory indexes."""
+    return bytes.fromhex(key)
+
+
+def volume_path(zip_path, number):
+    """Path of volume *number* (1-based) of a split export."""
+    return f"{os.path.splitext(zip_path)[0]}_part{number:03d}.zip"
+
+
+def checkpoint_path(zip_path):
+    """Checkpoint file of the export written to *zip_path*."""
+    return os.path.splitext(zip_path)[0] + CHECKPOINT_SUFFIX
+
+
+def latest_checkpoint(directory):
+    """Most recently updated export checkpoint in *directory*, or None."""
+    try:
+        candidates = [
+            entry for entry in os.scandir(directory)
+            if entry.name.endswith(CHECKPOINT_SUFFIX)
+        ]
+    except OSError:
+        return None
+    for entry in sorted(candidates, key=lambda e: e.stat().st_mtime, reverse=True):
+        if read_checkpoint(entry.path) is not None:
+            return entry.path
+    return None
+
+
+def export_volumes(zip_path):
+    """All volumes of the export *zip_path* belongs to, in order."""
+    match = _VOLUME.match(zip_path)
+    if match is None:
+        return [zip_path]
+    directory = os.path.dirname(zip_path)
+    prefix = os.path.basename(match.group(1)) + "_part"
+    try:
+        names = sorted(
+            name for name in os.listdir(directory or ".")
+            if name.startswith(prefix) and _VOLUME.match(name)
+            and len(name) == len(os.path.basename(zip_path))
+        )
+    except OSError:
+        return [zip_path]
+    return [os.path.join(directory, name) for name in names]
+
+
+@dataclass
+class ExportResult:
+    """What an export wrote: total labels, how many were rendered or copied.
+
+    ``repeats`` counts labels whose payload already appeared earlier in
+    this run of the batch; they are neither rendered nor copied from a
+    previous export.  Labels kept from an interrupted run are in neither
+    ``repeats`` nor the dedup ratio, so ``resumed + rendered + copied +
+    reused + repeats == labels``.
+    ``paths`` lists the archives written (more than one for split exports).
+    ``resumed`` counts labels kept from an interrupted run of the export,
+    and ``reused`` the labels of this run whose payload first appeared
+    among them (a copy of a kept entry, counted once per payload).
+    """
+    labels: int = 0
+    resumed: int = 0
+    reused: int = 0
+    rendered: int = 0
+    copied: int = 0
+    repeats: int = 0
+    bytes: int = 0
+    cancelled: bool = False
+    paths: list = field(default_factory=list)
+
+    def summary(self):
+        parts = [f"{self.rendered} rendered"]
+        if self.resumed:
+            parts.insert(0, f"{self.resumed} kept from the interrupted export")
+        if self.copied:
+            parts.append(f"{self.copied} copied from the previous export")
+        if self.reused:
+            parts.append(f"{self.reused} copied from kept entries")
+        if self.repeats:
+            # Over the labels of this run: every payload counts once
+            run = self.labels - self.resumed
+            parts.append(dedup_summary(run, run - self.repeats))
+        if len(self.paths) > 1:
+            parts.append(f"{len(self.paths)} volumes")
+        return ", ".join(parts)
+
+
+def read_manifest(zip_path):
+    """Return the manifest of an export archive, or None if it has none."""
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            return json.loads(zf.read(MANIFEST_NAME))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def new_export_path(directory, prefix="qr_export_"):
+    """A fresh timestamped archive path in *directory*, e.g. ``qr_export_20250101_120000.zip``.
+
+    Exports started within the same second get ``_2``, ``_3``, ...
+    appended, so a new export never lands on an earlier one (or its
+    volumes or checkpoint).
+    """
+    stem = os.path.join(directory, prefix + datetime.now().strftime("%Y%m%d_%H%M%S"))
+    path, n = f"{stem}.zip", 1
+    while any(os.path.exists(p) for p in (path, volume_path(path, 1), checkpoint_path(path))):
+        n += 1
+        path = f"{stem}_{n}.zip"
+    return path
+
+
+def latest_export(directory, prefix="qr_export_"):
+    """Most recently modified export archive in *directory* with a manifest.
+
+    For a split export this is one of its volumes; ``PreviousExport``
+    finds the others.
+    """
+    try:
+        candidates = [
+            entry for entry in os.scandir(directory)
+            if entry.name.startswith(prefix) and entry.name.endswith(".zip")
+        ]
+    except OSError:
+        return None
+    for entry in sorted(candidates, key=lambda e: e.stat().st_mtime, reverse=True):
+        if read_manifest(entry.path) is not None:
+            return entry.path
+    return None
+
+
+class PreviousExport:
+    """Read side of an earlier export: its entries indexed by manifest key."""
+
+    def __init__(self, zip_path, digest):
+        self.volumes = []
+        self.by_key = {}
+        try:
+            for path in export_volumes(zip_path):
+                zf = zipfile.ZipFile(path)
+                self.volumes.append(zf)
+                manifest = json.loads(zf.read(MANIFEST_NAME))
+                if manifest.get("digest") != digest:
+                    continue
+                for name, entry in manifest["entries"].items():
+                    try:
+                        self.by_key[entry["key"]] = (zf, zf.getinfo(name))
+                    except KeyError:
+                        pass  # listed but missing (e.g. a truncated archive)
+        except Exception:
+            self.close()
+            raise
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def raw(self, key):
+        """Return (ZipInfo, compressed bytes) of the entry stored under *key*."""
+        zf, info = self.by_key[key]
+        return info, read_raw(zf.fp, info)
+
+    def close(self):
+        for zf in self.volumes:
+            zf.close()
+
+
+def read_raw(fp, info):
+    """Read the compressed bytes of entry *info* from the archive file *fp*."""
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+    return fp.read(info.compress_size)
+
+
+def scan_entries(path):
+    """Validated entries of a possibly unfinished archive, in file order.
+
+    Entries are read from their local headers, so no central directory is
+    needed (e.g. after a crash).  Returns (ZipInfo, end offset) pairs and
+    stops at the first entry that is truncated, has no sizes in its
+    header, or fails its CRC check.
+    """
+    entries = []
+    with open(path, "rb") as fp:
+        while True:
+            offset = fp.tell()
+            header = fp.read(zipfile.sizeFileHeader)
+            if len(header) < zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+                break
+            (_, _, _, flags, method, dostime, dosdate, crc, compress_size, file_size,
+             name_len, extra_len) = struct.unpack(zipfile.structFileHeader, header)
+            name = fp.read(name_len)
+            fp.seek(extra_len, os.SEEK_CUR)
+            if flags & _DATA_DESCRIPTOR or not file_size or compress_size == 0xFFFFFFFF:
+                break  # an entry that was never finished (or not one of ours)
+            data = fp.read(compress_size)
+            if len(data) < compress_size:
+                break
+            try:
+                content = _inflate(method, data)
+            except (NotImplementedError, zlib.error):
+                break
+            if len(content) != file_size or zlib.crc32(content) != crc:
+                break
+            info = zipfile.ZipInfo(
+                name.decode("utf-8" if flags & 0x800 else "cp437"),
+                date_time=((dosdate >> 9) + 1980, (dosdate >> 5) & 0xF, dosdate & 0x1F,
+                           dostime >> 11, (dostime >> 5) & 0x3F, (dostime & 0x1F) * 2),
+            )
+            info.flag_bits = flags
+            info.compress_type = method
+            info.CRC = crc
+            info.compress_size = compress_size
+            info.file_size = file_size
+            info.header_offset = offset
+            info.external_attr = 0o600 << 16  # not in the local header; as written
+            entries.append((info, fp.tell()))
+    return entries
+
+
+def _inflate(method, data):
+    """Decompress the raw bytes of an entry stored with *method*."""
+    if method == zipfile.ZIP_STORED:
+        return data
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+    raise NotImplementedError(f"unsupported ZIP compression method {method}")
+
+
+def copy_raw(zf, name, info, data):
+    """Append already-compressed *data* to *zf* as entry *name*.
+
+    ``zipfile`` has no public raw-copy API; on the Python versions in
+    ``_RAW_COPY`` this mirrors how ``ZipFile.mkdir`` appends an entry whose
+    sizes and CRC are known.  Elsewhere the entry is decompressed and
+    written again through ``ZipFile.open`` (same content, more CPU).
+    """
+    zinfo = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    zinfo.compress_type = info.compress_type
+    zinfo.file_size = info.file_size
+    zinfo.external_attr = info.external_attr
+    if not _RAW_COPY:
+        with zf.open(zinfo, "w") as entry:
+            entry.write(_inflate(info.compress_type, data))
+        return zinfo
+    zinfo.flag_bits = info.flag_bits & ~_DATA_DESCRIPTOR
+    zinfo.CRC = info.CRC
+    zinfo.compress_size = info.compress_size
+    with zf._lock:
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[name] = zinfo
+        zf.fp.write(zinfo.FileHeader(zinfo.file_size > zipfile.ZIP64_LIMIT))
+        zf.fp.write(data)
+        zf.start_dir = zf.fp.tell()
+    return zinfo
+
+
+class ArchiveWriter:
+    """Stream export entries into one ZIP, or into volumes of bounded size.
+
+    Without limits everything goes to *zip_path*.  With *max_bytes* and/or
+    *max_labels* entries go to ``volume_path(zip_path, n)``, and a new
+    volume is started before an entry would take the current one past
+    either limit (headers, central directory and manifest included).  The
+    size of an entry that is still to be encoded is taken to be that of
+    the largest one so far.  Every volume carries the manifest of its own
+    entries, spooled to a temporary file until the volume is closed; no
+    label data is kept in memory, and the index of keys written holds a
+    digest and a position per distinct key.
+    """
+
+    def __init__(self, zip_path, compression, manifest, max_bytes=None, max_labels=None):
+        self.zip_path = zip_path
+        self.compression = compression
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.max_labels = max_labels
+        self.split = max_bytes is not None or max_labels is not None
+        self.paths = []
+        self.zf = None
+        self._file = None     # file object of a reopened volume
+        self._records = None  # manifest records of the open volume, one per line
+        self.count = 0        # entries in the open volume
+        self.largest = 0
+        self._used = 0        # final size of the open volume if it were closed now
+        self._written = {}    # key digest -> volume number << 32 | index of its first entry
+                              # (| _KEPT until a kept entry is first repeated)
+        self._readers = {}    # closed volume number -> ZipFile opened for reading
+
+    def __contains__(self, key):
+        return _key_digest(key) in self._written
+
+    def first_reuse(self, key):
+        """Whether *key* was kept from an interrupted run and not repeated since.
+
+        True once per such key; later entries with it repeat this run's.
+        """
+        digest = _key_digest(key)
+        first = self._written.get(digest, 0)
+        if not first & _KEPT:
+            return False
+        self._written[digest] = first & ~_KEPT
+        return True
+
+    def written_keys(self):
+        """Digests (see ``_key_digest``) of the keys written so far."""
+        return set(self._written)
+
+    def _open_volume(self, fp=None):
+        number = len(self.paths) + 1
+        path = volume_path(self.zip_path, number) if self.split else self.zip_path
+        self.zf = zipfile.ZipFile(fp or path, "w", self.compression, allowZip64=True)
+        self._file = fp
+        self.paths.append(path)
+        self._records = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.count = 0
+        empty = dict(self.manifest, volume=number, entries={})
+        self._used = _END_OVERHEAD + self._entry_cost(MANIFEST_NAME, len(json.dumps(empty)))
+
+    def recover(self, strings, digest, ext, limit):
+        """Pick up the volumes an interrupted run of this export left behind.
+
+        Volumes are checked in order: complete ones (every entry valid,
+        manifest present) are kept as they are; the first one that is not
+        is truncated after its last valid entry and reopened for writing,
+        and anything after it is deleted.  At most *limit* labels are kept.
+        Returns (labels kept, their uncompressed bytes).
+        """
+        done = nbytes = 0
+        number = 1
+        while True:
+            path = volume_path(self.zip_path, number) if self.split else self.zip_path
+            scanned = scan_entries(path) if os.path.exists(path) else []
+            kept = []
+            for info, end in scanned:
+                if done + len(kept) >= limit or info.filename != entry_name(done + len(kept), ext):
+                    break
+                kept.append((info, end))
+            complete = (
+                self.split and len(scanned) == len(kept) + 1
+                and scanned[-1][0].filename == MANIFEST_NAME
+                and os.path.exists(volume_path(self.zip_path, number + 1))
+            )
+            if not complete:
+                break
+            for index, (info, _) in enumerate(kept):
+                self._written.setdefault(_key_digest(cache_key(strings[done], digest)),
+                                         _KEPT | number << 32 | index)
+                done += 1
+                nbytes += info.file_size
+            self.paths.append(path)
+            number += 1
+
+        # Drop later volumes, then reopen this one after its kept entries
+        later = number + 1
+        while self.split and os.path.exists(volume_path(self.zip_path, later)):
+            os.remove(volume_path(self.zip_path, later))
+            later += 1
+        fp = open(path, "r+b" if os.path.exists(path) else "w+b")
+        try:
+            fp.seek(kept[-1][1] if kept else 0)
+            fp.truncate()
+            self._open_volume(fp)
+        except Exception:
+            fp.close()
+            raise
+        for info, _ in kept:
+            text = strings[done]
+            self.zf.filelist.append(info)
+            self.zf.NameToInfo[info.filename] = info
+            self._record(info.filename, cache_key(text, digest), text, info, _KEPT)
+            done += 1
+            nbytes += info.file_size
+        return done, nbytes
+
+    def _close_volume(self):
+        header = dict(self.manifest, volume=len(self.paths)) if self.split else self.manifest
+        zinfo = zipfile.ZipInfo(MANIFEST_NAME, date_time=time.localtime()[:6])
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.external_attr = 0o600 << 16
+        # Streamed record by record rather than built as one large string
+        with self.zf.open(zinfo, "w") as fp:
+            fp.write(json.dumps(header)[:-1].encode() + b', "entries": {')
+            self._records.seek(0)
+            for i, record in enumerate(self._records):
+                fp.write(f'{", " if i else ""}{record.rstrip()}'.encode())
+            fp.write(b"}}")
+        self.zf.close()
+        self.zf = None
+        self._release_file()
+
+    def _release_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+
+    @staticmethod
+    def _entry_cost(name, size):
+        return size + _ENTRY_OVERHEAD + 2 * len(name.encode())
+
+    def _cost(self, name, key, text, size):
+        """Bytes an entry of *size* adds to a volume, its manifest record included."""
+        record = json.dumps({name: {"key": key, "payload": text}})
+        return self._entry_cost(name, size) + len(record)
+
+    def _reserve(self, cost):
+        """Open a volume that an entry costing *cost* bytes fits into."""
+        if self.zf is not None and self.split and self.count:
+            full = (
+                (self.max_labels is not None and self.count >= self.max_labels)
+                or (self.max_bytes is not None and self._used + cost > self.max_bytes)
+            )
+            if full:
+                self._close_volume()
+        if self.zf is None:
+            self._open_volume()
+
+    def _record(self, name, key, text, zinfo, flags=0):
+        self._used += self._cost(name, key, text, zinfo.compress_size)
+        self.largest = max(self.largest, zinfo.compress_size)
+        record = json.dumps({"key": key, "payload": text})
+        self._records.write(f"{json.dumps(name)}: {record}\n")
+        self._written.setdefault(_key_digest(key), flags | len(self.paths) << 32 | self.count)
+        self.count += 1
+
+    def write(self, name, key, text, write, size=None):
+        """Add an entry whose content *write(fp)* streams into the archive."""
+        self._reserve(self._cost(name, key, text, self.largest if size is None else size))
+        zinfo = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        zinfo.compress_type = self.compression
+        zinfo.external_attr = 0o600 << 16  # as ZipFile.writestr
+        with self.zf.open(zinfo, "w") as entry:
+            write(entry)
+        self._record(name, key, text, zinfo)
+        return zinfo
+
+    def copy(self, name, key, text, info, data):
+        """Add an entry from the compressed bytes of *info* in another archive."""
+        self._reserve(self._cost(name, key, text, info.compress_size))
+        zinfo = copy_raw(self.zf, name, info, data)
+        self._record(name, key, text, zinfo)
+        return zinfo
+
+    def repeat(self, name, key, text):
+        """Add an entry with the same content as the first one under *key*."""
+        first = self._written[_key_digest(key)] & ~_KEPT
+        volume, index = first >> 32, first & 0xFFFFFFFF
+        if self.zf is not None and volume == len(self.paths):
+            source = self.zf
+        else:
+            source = self._readers.get(volume)
+            if source is None:
+                source = self._readers[volume] = zipfile.ZipFile(self.paths[volume - 1])
+        info = source.filelist[index]  # entries are listed in the order they were written
+        return self.copy(name, key, text, info, read_raw(source.fp, info))
+
+    def close(self):
+        """Finish the open volume (an empty export still gets one archive)."""
+        try:
+            if self.zf is None and not self.paths:
+                self._open_volume()
+            if self.zf is not None:
+                self._close_volume()
+        finally:
+            self._close_readers()
+
+    def abort(self, delete=True):
+        """Stop writing and (by default) delete every volume written so far."""
+        if self.zf is not None:
+            try:
+                self.zf.close()
+            finally:
+                self.zf = None
+                self._release_file()
+        self._close_readers()
+        for path in self.paths if delete else ():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _close_readers(self):
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+
+
+def _open_previous(previous, zip_path, digest):
+    """Entries of the earlier export at *previous*, or None if unusable."""
+    if previous is None:
+        return None
+    if os.path.abspath(previous) == os.path.abspath(zip_path):
+        raise ValueError("The previous export cannot be overwritten by the new one.")
+    try:
+        return PreviousExport(previous, digest)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None  # unreadable or no manifest: render everything
+
+
+def export_archive(zip_path, strings, settings, target_w, target_h, fmt="PNG",
+                   previous=None, workers=1, cancel=None, cache=None, profile=None,
+                   versions=None, progress=None, known=None, max_bytes=None,
+                   max_labels=None, checkpoint=False, pipeline=None):
+    """Write every label in *strings* to *zip_path*, with a manifest.
+
+    With *previous* (the path of an earlier export), unchanged labels are
+    copied from it and only the rest is rendered.  Each distinct payload
+    is rendered at most once; repeats are copied from the entry already
+    in the new archive.  *known* maps indices to (text, encoded bytes)
+    the caller already has for these settings and format (e.g. from the
+    GUI's artifact store); those are written without rendering.  With
+    *max_bytes* or *max_labels* the export is split into volumes (see
+    ``ArchiveWriter``); entry numbering continues across them.
+
+    Labels are rendered by *pipeline* (an ``ExportPipeline``, whose
+    memory target bounds the labels in flight; a default one otherwise).
+    *strings* must be a sequence (it is read twice).  *progress(count)* is
+    called after every entry.  Returns an ``ExportResult``; on cancel the
+    result is marked and the caller decides what to do with the partial
+    files in ``result.paths``.  On error they are removed, unless
+    *checkpoint* is set: then a checkpoint is kept next to the archive
+    while it is written, and a cancelled or failed export can be
+    continued with ``resume_export``.
+    """
+    digest = settings_digest(settings, target_w, target_h, fmt)
+    old = _open_previous(previous, zip_path, digest)
+    archive = ArchiveWriter(
+        zip_path, ZIP_COMPRESSION[fmt],
+        {"version": MANIFEST_VERSION, "digest": digest, "format": fmt},
+        max_bytes=max_bytes, max_labels=max_labels,
+    )
+    checkpointer = None
+    if checkpoint:
+        checkpointer = Checkpointer(checkpoint_path(zip_path), {
+            "archive": os.path.basename(zip_path),
+            "digest": digest,
+            "format": fmt,
+            "labels": len(strings),
+            "previous": previous and os.path.abspath(previous),
+            "max_bytes": max_bytes,
+            "max_labels": max_labels,
+        })
+        checkpointer.save()
+    return _write_export(archive, strings, ExportResult(), settings, target_w, target_h, fmt,
+                         digest, old, workers, cancel, cache, profile, versions,
+                         progress, known, checkpointer, pipeline)
+
+
+def resume_export(checkpoint_file, strings, settings, target_w, target_h, workers=1,
+                  cancel=None, cache=None, profile=None, versions=None, progress=None,
+                  known=None, pipeline=None):
+    """Continue the interrupted export recorded in *checkpoint_file*.
+
+    *strings*, the settings and the label size must be those the export
+    was started with (``ValueError`` otherwise).  Labels the checkpoint
+    lists as completed and whose entries are intact on disk are kept; the
+    export continues from the first one missing, with the format, volume
+    limits and previous export it was started with.  Returns an
+    ``ExportResult`` covering the whole batch.
+    """
+    state = read_checkpoint(checkpoint_file)
+    if state is None:
+        raise ValueError("There is no interrupted export to resume.")
+    fmt = state["format"]
+    digest = settings_digest(settings, target_w, target_h, fmt)
+    if digest != state["digest"]:
+        raise ValueError("The design settings or label size differ from the interrupted export.")
+    verify_prefix(strings, state)
+
+    zip_path = os.path.join(os.path.dirname(checkpoint_file), state["archive"])
+    archive = ArchiveWriter(
+        zip_path, ZIP_COMPRESSION[fmt],
+        {"version": MANIFEST_VERSION, "digest": digest, "format": fmt},
+        max_bytes=state.get("max_bytes"), max_labels=state.get("max_labels"),
+    )
+    try:
+        done, nbytes = archive.recover(strings, digest, FORMAT_EXTENSIONS[fmt][0],
+                                       state["completed"])
+    except BaseException:
+        archive.abort(delete=False)
+        raise
+    hasher, _ = prefix_hash(strings, done)
+    checkpointer = Checkpointer(checkpoint_file, state, completed=done, hasher=hasher)
+    checkpointer.save()
+    old = _open_previous(state.get("previous"), zip_path, digest)
+    result = ExportResult(labels=done, resumed=done, bytes=nbytes)
+    return _write_export(archive, strings, result, settings, target_w, target_h, fmt, digest,
+                         old, workers, cancel, cache, profile, versions, progress, known,
+                         checkpointer, pipeline)
+
+
+def _write_export(archive, strings, result, settings, target_w, target_h, fmt, digest, old,
+                  workers, cancel, cache, profile, versions, progress, known, checkpointer,
+                  pipeline):
+    """Write the labels of *strings* from ``result.labels`` on into *archive*."""
+    profile = profile or NULL_PROFILE
+    ext = FORMAT_EXTENSIONS[fmt][0]
+    start = result.labels
+    known = known or {}
+
+    def prepared(i, text):
+        entry = known.get(i)
+        return entry[1] if entry is not None and entry[0] == text else None
+
+    seen = archive.written_keys()  # taken here: misses() runs on the pipeline's read thread
+
+    def misses():
+        for i, text in enumerate(islice(strings, start, None), start):
+            key = cache_key(text, digest)
+            if _key_digest(key) not in seen and (old is None or key not in old):
+                seen.add(_key_digest(key))
+                if prepared(i, text) is None:
+                    yield text
+
+    pipeline = pipeline or ExportPipeline()
+    encoded = pipeline.run(misses(), settings, target_w, target_h, fmt, workers=workers,
+                           cancel=cancel, cache=cache, profile=profile, versions=versions,
+                           writers=True)
+    try:
+        for i, text in enumerate(islice(strings, start, None), start):
+            if cancel is not None and cancel.is_set():
+                result.cancelled = True
+                break
+            key = cache_key(text, digest)
+            name = entry_name(i, ext)
+            if key in archive:
+                with profile.stage("zip_copy"):
+                    info = archive.repeat(name, key, text)
+                if archive.first_reuse(key):
+                    result.reused += 1
+                else:
+                    result.repeats += 1
+            elif old is not None and key in old:
+                with profile.stage("zip_copy"):
+                    info, data = old.raw(key)
+                    info = archive.copy(name, key, text, info, data)
+                result.copied += 1
+            else:
+                data = prepared(i, text)
+                if data is not None:
+                    write, size = lambda fp: fp.write(data), len(data)
+                else:
+                    # Raster labels rendered in process are encoded into the entry itself
+                    write, size = next(encoded, (None, None))
+                    if write is None:  # rendering stopped on cancel
+                        result.cancelled = True
+                        break
+                with profile.stage("zip_write"):
+                    info = archive.write(name, key, text, write, size)
+                result.rendered += 1
+            result.bytes += info.file_size
+            result.labels += 1
+            if checkpointer is not None:
+                checkpointer.advance(text)
+            profile.add_labels()
+            if progress is not None:
+                progress(result.labels)
+        archive.close()
+        if checkpointer is not None:
+            if result.cancelled:
+                checkpointer.save()
+            else:
+                checkpointer.remove()
+    except BaseException:
+        if checkpointer is None:
+            archive.abort()
+        else:
+            # Keep what was written; the checkpoint says how far it got
+            try:
+                archive.abort(delete=False)
+            finally:
+                checkpointer.save()
+        raise
+    finally:
+        encoded.close()  # stops the pipeline if rendering stopped early
+        if old is not None:
+            old.close()
+    result.paths = archive.paths
+    return result
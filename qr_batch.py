@@ -0,0 +1,59 @@
+"""File-backed batch of payloads that stays on disk.
+
+``FileBatch`` memory-maps a text file and keeps only a table of line
+offsets, so navigation, preview and export can read entries on demand
+without the whole batch ever being held as Python strings.
+"""
+import mmap
+import os
+from array import array
+from collections.abc import Sequence
+
+BOM = b"\xef\xbb\xbf"
+
+
+class FileBatch(Sequence):
+    """Lazy sequence of the non-empty, stripped lines of a UTF-8 text file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""  # mmap cannot map an empty file
+        self._starts, self._ends = self._build_index()
+
+    def _build_index(self):
+        """Record (start, end) byte offsets of every non-blank line."""
+        data = self._data
+        starts, ends = array("Q"), array("Q")
+        pos = len(BOM) if data[:len(BOM)] == BOM else 0
+        size = len(data)
+        while pos < size:
+            end = data.find(b"\n", pos)
+            if end == -1:
+                end = size
+            if data[pos:end].strip():
+                starts.append(pos)
+                ends.append(end)
+            pos = end + 1
+        return starts, ends
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        raw = self._data[self._starts[index]:self._ends[index]]
+        return raw.decode("utf-8", errors="replace").strip()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
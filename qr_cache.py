@@ -0,0 +1,165 @@
+"""Content-addressed on-disk cache of encoded labels.
+
+Entries are keyed by a hash of the payload plus everything that affects the
+output bytes (design settings, logo file, target pixel size, DPI and output
+format), so a repeat export of an unchanged list is served from disk.  The
+cache is bounded by total size; the least recently used entries are evicted
+first.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict
+
+from qr_render import OUTPUT_DPI
+
+CACHE_DIR = ".qr_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO = 0.9  # fraction of max_bytes kept after an eviction pass
+
+_logo_hashes = {}  # (path, size, mtime) -> SHA-256 of the logo file
+
+
+def logo_hash(path):
+    """SHA-256 of the logo file at *path*, or None if it can't be read.
+
+    Hashed once per version of the file on disk (path, size, mtime).
+    """
+    try:
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = _logo_hashes.get(stamp)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = _logo_hashes[stamp] = hashlib.sha256(f.read()).hexdigest()
+        return digest
+    except OSError:
+        return None
+
+
+def settings_digest(settings, target_w, target_h, fmt="PNG", dpi=OUTPUT_DPI):
+    """Hash everything except the payload that determines a label's bytes.
+
+    The logo counts by its contents, not its path, so digests agree between
+    machines (e.g. for sharded runs merged into one export).
+    """
+    fields = asdict(settings)
+    fields.pop("logo_path")
+    blob = json.dumps(
+        {
+            "settings": fields,
+            "logo": logo_hash(settings.logo_path),
+            "target": [target_w, target_h],
+            "dpi": dpi,
+            "format": fmt.upper(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cache_key(text, digest):
+    """Key of one payload rendered with the settings behind *digest*."""
+    return hashlib.sha256(f"{digest}\0{text}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Size-bounded LRU store of encoded label bytes in *directory*."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        """Yield (path, size, last_used) for every entry on disk."""
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        """Return the cached bytes for *key*, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data)
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits again."""
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda e: e[2])
+            size = sum(e[1] for e in entries)
+            limit = self.max_bytes * EVICT_TO
+            for path, entry_size, _ in entries:
+                if size <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+                self.evictions += 1
+            self._size = size
+
+    def stats(self):
+        """Return a dict describing the cache contents and hit rate."""
+        entries = list(self._scan())
+        lookups = self.hits + self.misses
+        return {
+            "directory": os.path.abspath(self.directory),
+            "entries": len(entries),
+            "bytes": sum(e[1] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def report(self):
+        """One-line human readable summary of ``stats()``."""
+        s = self.stats()
+        return (
+            f"Render cache: {s['entries']} entries, {s['bytes'] / 1e6:.1f} / "
+            f"{s['max_bytes'] / 1e6:.0f} MB, {s['hits']} hits, {s['misses']} misses "
+            f"({s['hit_rate']:.0%} hit rate), {s['evictions']} evicted"
+        )
@@ -0,0 +1,104 @@
+"""Checkpoints that let an interrupted export continue where it stopped.
+
+A checkpoint is a small JSON file next to the output.  Besides what the
+export was started with (settings digest, format, limits) it records how
+many labels were completed and a running SHA-256 of exactly those
+payloads, so a resume can tell whether it was given the same batch
+without storing the batch itself.  Writes are atomic and rate-limited.
+"""
+import hashlib
+import json
+import os
+import time
+from itertools import islice
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_INTERVAL = 2.0  # seconds between checkpoint writes during an export
+
+
+def payload_hash():
+    """A fresh running hash of payloads (see ``add_payload``)."""
+    return hashlib.sha256()
+
+
+def add_payload(hasher, text):
+    hasher.update(text.encode("utf-8"))
+    hasher.update(b"\0")
+
+
+def read_checkpoint(path):
+    """Return the checkpoint at *path*, or None if it is missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        return None
+    return state
+
+
+def write_checkpoint(path, state):
+    """Atomically replace the checkpoint at *path* with *state*."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(state, version=CHECKPOINT_VERSION), f)
+    os.replace(tmp, path)
+
+
+def prefix_hash(strings, count):
+    """Return (running hash, payloads hashed) over the first *count* of *strings*."""
+    hasher = payload_hash()
+    hashed = 0
+    for text in islice(strings, count):
+        add_payload(hasher, text)
+        hashed += 1
+    return hasher, hashed
+
+
+def verify_prefix(strings, state):
+    """Check that *strings* starts with the payloads *state* completed.
+
+    Returns the running hash over those payloads, ready to continue.
+    Raises ``ValueError`` if the batch is shorter or different.
+    """
+    hasher, hashed = prefix_hash(strings, state["completed"])
+    if hashed < state["completed"]:
+        raise ValueError("The batch is shorter than the interrupted export.")
+    if hasher.hexdigest() != state["payloads"]:
+        raise ValueError("The batch differs from the one the interrupted export was started with.")
+    return hasher
+
+
+class Checkpointer:
+    """Keep the checkpoint of a running export up to date.
+
+    ``advance(text)`` is called for every completed label, in order; the
+    file is rewritten at most every *interval* seconds and on ``save()``.
+    """
+
+    def __init__(self, path, state, completed=0, hasher=None, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.state = dict(state)
+        self.completed = completed
+        self.hasher = hasher or payload_hash()
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def advance(self, text):
+        add_payload(self.hasher, text)
+        self.completed += 1
+        if time.monotonic() - self._last >= self.interval:
+            self.save()
+
+    def save(self, **changes):
+        self.state.update(changes)
+        self.state.update(completed=self.completed, payloads=self.hasher.hexdigest())
+        write_checkpoint(self.path, self.state)
+        self._last = time.monotonic()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
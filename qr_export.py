@@ -0,0 +1,250 @@
+"""Label encoding: output formats, single labels and batches.
+
+Besides the in-process encoders, this module holds the entry points run
+in worker processes (``_init_worker`` / ``_encode_chunk``, used by the
+``ExportPipeline`` pool and ``encode_batch`` for the render server) and
+the payload de-duplication of CLI batches.
+"""
+import hashlib
+import io
+import os
+import zipfile
+from collections import Counter, OrderedDict, deque
+from itertools import islice
+
+from qr_cache import cache_key, settings_digest
+from qr_profile import NULL_PROFILE, Profile
+from qr_render import LabelRenderer, OUTPUT_DPI
+from qr_vector import render_pdf, render_svg
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 8          # labels per worker task
+CHUNKS_PER_WORKER = 2   # tasks kept in flight per worker
+DEDUP_WINDOW = 65536    # distinct payloads remembered by iter_deduplicated
+
+# Output formats and their file extensions (first one is used for writing)
+FORMAT_EXTENSIONS = {
+    "PNG": (".png",),
+    "JPEG": (".jpg", ".jpeg"),
+    "SVG": (".svg",),
+    "PDF": (".pdf",),
+}
+VECTOR_WRITERS = {"SVG": render_svg, "PDF": render_pdf}
+
+# PNG, JPEG and PDF (Flate streams) are already compressed; deflating them
+# again in the ZIP only costs CPU, so they are stored as-is.
+ZIP_COMPRESSION = {
+    "PNG": zipfile.ZIP_STORED,
+    "JPEG": zipfile.ZIP_STORED,
+    "PDF": zipfile.ZIP_STORED,
+    "SVG": zipfile.ZIP_DEFLATED,
+}
+
+# Per-process state, set up once by _init_worker
+_worker_renderer = None
+_worker_target = None
+
+
+def format_for_path(path, default="PNG"):
+    """Pick the output format from a file name's extension."""
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, extensions in FORMAT_EXTENSIONS.items():
+        if ext in extensions:
+            return fmt
+    return default
+
+
+def version_summary(versions):
+    """Summarize a Counter of QR versions, e.g. ``"v2 x90, v3 x10"``."""
+    return ", ".join(f"v{version} x{count}" for version, count in sorted(versions.items()))
+
+
+def dedup_summary(total, unique):
+    """Describe the repeats in a batch, e.g. ``"40 repeated payload(s), dedup ratio 1.67x"``."""
+    ratio = total / unique if unique else 1.0
+    return f"{total - unique} repeated payload(s), dedup ratio {ratio:.2f}x"
+
+
+def deduplicate(texts):
+    """Return (distinct payloads in first-seen order, index into them for each of *texts*)."""
+    unique, order, index = [], [], {}
+    for text in texts:
+        i = index.get(text)
+        if i is None:
+            i = index[text] = len(unique)
+            unique.append(text)
+        order.append(i)
+    return unique, order
+
+
+def iter_deduplicated(texts, encode, window=DEDUP_WINDOW):
+    """Yield (text, data, first) for every payload in *texts*, in input order.
+
+    *encode* maps an iterable of payloads to their encoded bytes in order
+    (e.g. ``ExportPipeline.run`` with its settings bound).  For a first
+    occurrence *first* is None; for a repeat *data* is None and *first* is
+    the 0-based position of the occurrence it repeats, which the caller has
+    already been given.  Only the *window* most recently seen distinct
+    payloads are remembered (as digests), so memory stays flat on batches
+    of any length; a repeat of a payload that dropped out of the window is
+    encoded again.
+    """
+    first_seen = OrderedDict()  # payload digest -> first position, least recent first
+    pending = deque()  # (text, first position or None), in input order
+
+    def distinct():
+        for i, text in enumerate(texts):
+            key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            first = first_seen.get(key)
+            if first is None:
+                first_seen[key] = i
+                if len(first_seen) > window:
+                    first_seen.popitem(last=False)
+                pending.append((text, None))
+                yield text
+            else:
+                first_seen.move_to_end(key)
+                pending.append((text, first))
+
+    def repeats():
+        while pending and pending[0][1] is not None:
+            text, first = pending.popleft()
+            yield text, None, first
+
+    for data in encode(distinct()):
+        yield from repeats()
+        yield pending.popleft()[0], data, None
+    yield from repeats()
+
+
+def encode_label(renderer, text, target_w, target_h, fmt="PNG"):
+    """Render one label and return its encoded bytes.
+
+    A target size of ``None`` renders the bare QR code the CLI writes by
+    default instead of a full label.  SVG and PDF are written as vectors
+    from the label layout; other formats are rasterized by Pillow.
+    """
+    if fmt in VECTOR_WRITERS:
+        if target_w is None or target_h is None:
+            layout = renderer.code_layout(text)
+        else:
+            layout = renderer.layout(text, target_w, target_h)
+        with renderer.profile.stage("vector_encode"):
+            return VECTOR_WRITERS[fmt](layout)
+
+    if target_w is None or target_h is None:
+        img = renderer.render_code(text)
+    else:
+        img = renderer.render(text, target_w, target_h)
+    with renderer.profile.stage("image_encode"):
+        return encode_image(img, fmt, renderer.settings)
+
+
+def encode_labels(renderer, texts, target_w, target_h, fmt="PNG"):
+    """Like ``encode_label`` for a list of *texts*.
+
+    Raster labels are drawn with one batched QR rasterization per group of
+    same-version codes; vector formats are written label by label.
+    """
+    if fmt in VECTOR_WRITERS:
+        return [encode_label(renderer, text, target_w, target_h, fmt) for text in texts]
+
+    if target_w is None or target_h is None:
+        images = renderer.render_codes(texts)
+    else:
+        images = renderer.render_many(texts, target_w, target_h)
+    with renderer.profile.stage("image_encode"):
+        return [encode_image(img, fmt, renderer.settings) for img in images]
+
+
+def encode_batch(settings, texts, target_w, target_h, fmt="PNG"):
+    """Encode *texts* with *settings* in this process.
+
+    Picklable entry point for long-lived pools whose tasks each carry their
+    own settings (e.g. the render server); fonts, logos and templates stay
+    warm in the worker's process-wide caches between tasks.
+    """
+    return encode_labels(LabelRenderer(settings), texts, target_w, target_h, fmt)
+
+
+def encode_image(img, fmt, settings, fp=None):
+    """Encode a rendered label with the settings' PNG compression level.
+
+    Besides the raster export formats, "DIB" gives the headerless RGB
+    bitmap the Windows clipboard takes as ``CF_DIB``.  With *fp* the
+    encoding is written there (e.g. an open ZIP entry) instead of being
+    returned.
+    """
+    buf = io.BytesIO() if fp is None else fp
+    if fmt == "DIB":
+        img.convert("RGB").save(buf, format="DIB")
+    elif fmt == "PNG":
+        img.save(buf, format=fmt, dpi=(OUTPUT_DPI, OUTPUT_DPI),
+                 compress_level=settings.png_compress_level)
+    else:
+        if fmt == "JPEG" and img.mode in ("1", "P"):
+            img = img.convert("L")  # JPEG has no 1-bit or palette mode
+        img.save(buf, format=fmt, dpi=(OUTPUT_DPI, OUTPUT_DPI))
+    return buf.getvalue() if fp is None else None
+
+
+def _init_worker(settings, target_w, target_h, fmt, profiling, count_versions):
+    global _worker_renderer, _worker_target
+    _worker_renderer = LabelRenderer(
+        settings,
+        profile=Profile() if profiling else None,
+        versions=Counter() if count_versions else None,
+    )
+    _worker_target = (target_w, target_h, fmt)
+
+
+def _encode_chunk(texts):
+    """Encode *texts*; also returns this chunk's stage timings and QR versions."""
+    target_w, target_h, fmt = _worker_target
+    results = encode_labels(_worker_renderer, texts, target_w, target_h, fmt)
+    profile = _worker_renderer.profile
+    versions = _worker_renderer.versions
+    if versions is not None:
+        _worker_renderer.versions = Counter()
+    return results, profile.snapshot() if profile.enabled else None, versions
+
+
+def _chunks(texts, size):
+    it = iter(texts)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_encoded(texts, settings, target_w, target_h, fmt="PNG", cache=None, profile=None,
+                 versions=None):
+    """Yield the encoded bytes of every label in *texts*, in input order, in this process.
+
+    When a ``RenderCache`` is given, hits are served from disk and only
+    misses are rendered.  Stage timings are added to *profile* if given,
+    and the QR version of every rendered label to the *versions* Counter.
+    """
+    profile = profile or NULL_PROFILE
+    digest = settings_digest(settings, target_w, target_h, fmt) if cache else None
+    renderer = LabelRenderer(settings, profile=profile, versions=versions)
+    for chunk in _chunks(texts, CHUNK_SIZE):
+        if cache is None:
+            yield from encode_labels(renderer, chunk, target_w, target_h, fmt)
+            continue
+        with profile.stage("cache_lookup"):
+            keys = [cache_key(text, digest) for text in chunk]
+            found = [cache.get(key) for key in keys]
+        misses = [text for text, data in zip(chunk, found) if data is None]
+        rendered = iter(encode_labels(renderer, misses, target_w, target_h, fmt))
+        for key, data in zip(keys, found):
+            if data is None:
+                data = next(rendered)
+                cache.put(key, data)
+            yield data
+
+
+def encode_one(settings, text, target_w, target_h, fmt="PNG", cache=None):
+    """Encode a single label, going through *cache* when one is given."""
+    return next(iter_encoded([text], settings, target_w, target_h, fmt, cache=cache))
@@ -1,32 +1,45 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import qrcode
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import Image, ImageTk
 import os
-import io
 import win32clipboard
-import textwrap
-import zipfile
 import threading
-from datetime import datetime
+import time
+from collections import Counter
+
+from qr_archive import (
+    export_archive, latest_checkpoint, latest_export, new_export_path, resume_export
+)
+from qr_checkpoint import read_checkpoint
+from qr_batch import FileBatch
+from qr_cache import RenderCache
+from qr_export import (
+    DEFAULT_WORKERS, FORMAT_EXTENSIONS, encode_one, format_for_path, version_summary
+)
+from qr_pipeline import PIPELINE_MEMORY, ExportPipeline
+from qr_preview import ArtifactStore, Prefetcher, RenderWorker
+from qr_profile import NULL_PROFILE, Profile
+from qr_render import (
+    COLOR_MODES, ENCODING_PROFILES, SEGMENT_MODES, LabelRenderer, LabelSettings, target_pixels
+)
+from qr_vector import PDF_FONTS
 
 OUTPUT_DIR = "generatedQRs"
-LOGO_PATH = "sources\Prysmian_Logo_CMYK_Black.png"
-OUTPUT_DPI = 300
-CM_TO_PX = OUTPUT_DPI / 2.54  # ~118.11 pixels per cm
-IN_TO_PX = OUTPUT_DPI          # 300 pixels per inch
+MAX_TEXT_LINES = 2000  # larger batches stay on disk instead of in the text box
+PROGRESS_REFRESH_MS = 100  # export progress is redrawn at this interval
 
 
 class QRGeneratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("QR Code Generator")
-        self.root.geometry("600x920")
+        self.root.geometry("600x1010")
         self.root.resizable(True, True)
 
         self.current_qr_image = None
         self.strings_list = []
         self.current_index = 0
+        self.file_batch = None
 
         # Design settings variables
         self.logo_align_var = tk.StringVar(value="left")
@@ -37,6 +50,26 @@ class QRGeneratorApp:
         self.text_size_var = tk.IntVar(value=35)
         self.font_var = tk.StringVar(value="Arial")
         self.unit_var = tk.StringVar(value="in")
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)
+        self.use_cache_var = tk.BooleanVar(value=False)
+        self.export_format_var = tk.StringVar(value="PNG")
+        self.colors_var = tk.StringVar(value="rgb")
+        self.png_level_var = tk.IntVar(value=6)
+        self.encoding_var = tk.StringVar(value="standard")
+        self.segments_var = tk.StringVar(value="optimal")
+        self.profile_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=True)
+        self.volume_mb_var = tk.IntVar(value=0)
+        self.volume_labels_var = tk.IntVar(value=0)
+        self.memory_mb_var = tk.IntVar(value=PIPELINE_MEMORY // (1024 * 1024))
+        self.render_cache = None
+        self.artifacts = ArtifactStore()
+        self.prefetcher = Prefetcher(self.artifacts)
+        # Rendering runs off the Tk thread; results come back via root.after
+        dispatch = lambda callback: self.root.after(0, callback)
+        self.preview_worker = RenderWorker(dispatch)
+        self.save_worker = RenderWorker(dispatch)
+        self.copy_worker = RenderWorker(dispatch)
 
         self.setup_ui()
 
@@ -127,6 +160,14 @@ class QRGeneratorApp:
         )
         self.export_zip_btn.pack(side=tk.LEFT, padx=5)
 
+        self.resume_zip_btn = ttk.Button(
+            buttons_frame2,
+            text="Resume Export",
+            command=self._resume_export,
+            state=tk.DISABLED
+        )
+        self.resume_zip_btn.pack(side=tk.LEFT, padx=5)
+
         # Navigation bar
         nav_frame = ttk.Frame(main_frame)
         nav_frame.pack(pady=(0, 5))
@@ -209,6 +250,69 @@ class QRGeneratorApp:
             state="readonly", width=18
         )
         font_combo.grid(row=4, column=1, columnspan=3, sticky=tk.W, pady=(3, 0))
+        ttk.Label(design_frame, text="Workers:").grid(row=4, column=4, padx=(10, 2), pady=(3, 0))
+        ttk.Entry(design_frame, textvariable=self.workers_var, width=5).grid(
+            row=4, column=5, pady=(3, 0)
+        )
+
+        # Cache row
+        ttk.Checkbutton(
+            design_frame, text="Use render cache", variable=self.use_cache_var
+        ).grid(row=5, column=0, columnspan=4, sticky=tk.W, pady=(3, 0))
+        ttk.Label(design_frame, text="Export:").grid(row=5, column=4, padx=(10, 2), pady=(3, 0))
+        ttk.Combobox(
+            design_frame, textvariable=self.export_format_var,
+            values=list(FORMAT_EXTENSIONS), state="readonly", width=6
+        ).grid(row=5, column=5, columnspan=2, sticky=tk.W, pady=(3, 0))
+
+        # Output colour / compression row
+        ttk.Label(design_frame, text="Colors:").grid(row=6, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Combobox(
+            design_frame, textvariable=self.colors_var,
+            values=list(COLOR_MODES), state="readonly", width=8
+        ).grid(row=6, column=1, columnspan=3, sticky=tk.W, pady=(3, 0))
+        ttk.Label(design_frame, text="PNG level:").grid(row=6, column=4, padx=(10, 2), pady=(3, 0))
+        ttk.Spinbox(
+            design_frame, textvariable=self.png_level_var, from_=0, to=9, width=4
+        ).grid(row=6, column=5, pady=(3, 0))
+
+        # Diagnostics row
+        ttk.Checkbutton(
+            design_frame, text="Profile export stages", variable=self.profile_var
+        ).grid(row=7, column=0, columnspan=4, sticky=tk.W, pady=(3, 0))
+        ttk.Label(design_frame, text="Encoding:").grid(row=7, column=4, padx=(10, 2), pady=(3, 0))
+        ttk.Combobox(
+            design_frame, textvariable=self.encoding_var,
+            values=list(ENCODING_PROFILES), state="readonly", width=8
+        ).grid(row=7, column=5, columnspan=2, sticky=tk.W, pady=(3, 0))
+
+        # Payload segmentation row
+        ttk.Label(design_frame, text="Segments:").grid(row=8, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Combobox(
+            design_frame, textvariable=self.segments_var,
+            values=list(SEGMENT_MODES), state="readonly", width=10
+        ).grid(row=8, column=1, columnspan=3, sticky=tk.W, pady=(3, 0))
+        ttk.Checkbutton(
+            design_frame, text="Reuse previous export", variable=self.incremental_var
+        ).grid(row=8, column=4, columnspan=3, sticky=tk.W, padx=(10, 0), pady=(3, 0))
+
+        # ZIP volume row (0 = no limit)
+        ttk.Label(design_frame, text="Split ZIP:").grid(row=9, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Entry(design_frame, textvariable=self.volume_mb_var, width=6).grid(
+            row=9, column=1, columnspan=2, sticky=tk.W, pady=(3, 0)
+        )
+        ttk.Label(design_frame, text="MB").grid(row=9, column=3, sticky=tk.W, pady=(3, 0))
+        ttk.Label(design_frame, text="Labels/ZIP:").grid(row=9, column=4, padx=(10, 2), pady=(3, 0))
+        ttk.Entry(design_frame, textvariable=self.volume_labels_var, width=7).grid(
+            row=9, column=5, columnspan=2, sticky=tk.W, pady=(3, 0)
+        )
+
+        # Export pipeline row: peak memory of labels in flight
+        ttk.Label(design_frame, text="Memory:").grid(row=10, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Entry(design_frame, textvariable=self.memory_mb_var, width=6).grid(
+            row=10, column=1, columnspan=2, sticky=tk.W, pady=(3, 0)
+        )
+        ttk.Label(design_frame, text="MB").grid(row=10, column=3, sticky=tk.W, pady=(3, 0))
 
         # QR Code preview section
         preview_label = ttk.Label(main_frame, text="Preview:")
@@ -284,136 +388,41 @@ class QRGeneratorApp:
         self._resize_after_id = None
         self.qr_canvas.bind('<Configure>', self._on_canvas_resize)
 
-    def _calc_x(self, align, canvas_width, element_width, padding):
-        """Calculate horizontal position based on alignment."""
-        if align == "left":
-            return padding
-        elif align == "right":
-            return canvas_width - element_width - padding
-        else:
-            return (canvas_width - element_width) // 2
-
-    def _build_qr_image(self, text, target_w, target_h):
-        """Build a QR code image at exact target dimensions.
-
-        All elements (logo, QR, text, spacing) are sized proportionally to
-        the target canvas.  The QR code is always rendered as a perfect square.
-        """
-        # Font setup
-        font_map = {
-            "Arial": "arial.ttf",
-            "Times New Roman": "times.ttf",
-            "Verdana": "verdana.ttf",
-        }
-        font_file = font_map.get(self.font_var.get(), "arial.ttf")
-
-        logo_align = self.logo_align_var.get()
-        qr_align = self.qr_align_var.get()
-        text_align = self.text_align_var.get()
-
-        # Proportional scale (defaults calibrated for 1200x600 = 4"x2" @300 DPI)
-        scale = min(target_w / 1200, target_h / 600)
-
-        # Spacing
-        padding = max(1, round(25 * scale))
-        gap = max(1, round(15 * scale))
-        content_w = target_w - 2 * padding
-
-        # --- Logo ---
-        logo = Image.open(LOGO_PATH).convert("RGBA")
-        logo_aspect = logo.width / logo.height
-        user_logo_w = max(50, min(1000, self.logo_size_var.get()))
-        logo_width = max(1, round(user_logo_w * scale))
-        if logo_width > content_w:
-            logo_width = content_w
-        logo_height = max(1, round(logo_width / logo_aspect))
-        logo = logo.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
-
-        # --- Text ---
-        user_text_size = max(6, min(100, self.text_size_var.get()))
-        text_font_size = max(6, round(user_text_size * scale))
-
+    def _get_settings(self):
+        """Snapshot the design settings into an immutable LabelSettings."""
         try:
-            font = ImageFont.truetype(font_file, text_font_size)
-        except Exception:
-            font = ImageFont.load_default()
-
-        avg_char_w = text_font_size * 0.6
-        wrap_width = max(10, int(content_w / max(1, avg_char_w)))
-        wrapped_text = textwrap.fill(text, width=wrap_width)
-
-        temp_img = Image.new("RGB", (1, 1))
-        temp_draw = ImageDraw.Draw(temp_img)
-        text_bbox = temp_draw.textbbox((0, 0), wrapped_text, font=font)
-        text_h = text_bbox[3] - text_bbox[1]
-        text_w = text_bbox[2] - text_bbox[0]
-
-        # --- QR code (always square) ---
-        used_h = padding + logo_height + gap + gap + text_h + padding
-        qr_max_h = max(1, target_h - used_h)
-        qr_size = max(1, min(qr_max_h, content_w))
-
-        # Generate QR: first pass to determine module count
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=1,
-            border=4,
-        )
-        qr.add_data(text)
-        qr.make(fit=True)
-        total_modules = qr.modules_count + 2 * qr.border
-
-        # Regenerate at optimal box_size for the target QR pixel size
-        box_size = max(1, qr_size // total_modules)
-        qr_final = qrcode.QRCode(
-            version=qr.version,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=box_size,
-            border=4,
-        )
-        qr_final.add_data(text)
-        qr_final.make(fit=True)
-        qr_img = qr_final.make_image(fill_color="black", back_color="white").convert("RGB")
-
-        # Resize to exact square target (NEAREST keeps module edges sharp)
-        if qr_img.size[0] != qr_size:
-            qr_img = qr_img.resize((qr_size, qr_size), Image.Resampling.NEAREST)
-
-        # --- Compose final image at exact target dimensions ---
-        final_img = Image.new("RGB", (target_w, target_h), "white")
-
-        # Logo at top
-        logo_x = self._calc_x(logo_align, target_w, logo_width, padding)
-        final_img.paste(logo, (logo_x, padding), logo)
-
-        # QR code below logo (square)
-        qr_x = self._calc_x(qr_align, target_w, qr_size, padding)
-        qr_y = padding + logo_height + gap
-        final_img.paste(qr_img, (qr_x, qr_y))
-
-        # Text below QR
-        draw = ImageDraw.Draw(final_img)
-        text_x = self._calc_x(text_align, target_w, text_w, padding)
-        text_y = qr_y + qr_size + gap
-        draw.text((text_x, text_y), wrapped_text, fill="black", font=font)
-
-        return final_img
+            return LabelSettings(
+                logo_align=self.logo_align_var.get(),
+                qr_align=self.qr_align_var.get(),
+                text_align=self.text_align_var.get(),
+                logo_size=self.logo_size_var.get(),
+                text_size=self.text_size_var.get(),
+                font=self.font_var.get(),
+                color_mode=COLOR_MODES[self.colors_var.get()],
+                png_compress_level=max(0, min(9, self.png_level_var.get())),
+                encoding=self.encoding_var.get(),
+                segments=self.segments_var.get(),
+            )
+        except tk.TclError:
+            raise ValueError("Logo width, font size and PNG level must be whole numbers.")
 
     def generate_qr(self):
-        raw_text = self.text_input.get("1.0", tk.END)
-        lines = [line.strip() for line in raw_text.splitlines()]
-        lines = [line for line in lines if line]
+        if self.file_batch is not None:
+            lines = self.file_batch
+        else:
+            raw_text = self.text_input.get("1.0", tk.END)
+            lines = [line.strip() for line in raw_text.splitlines()]
+            lines = [line for line in lines if line]
 
         if not lines:
             messagebox.showwarning("Warning", "Please enter some text to encode.")
             return
 
-        if len(lines) > 2000:
+        if self.file_batch is None and len(lines) > MAX_TEXT_LINES:
             messagebox.showwarning(
                 "Warning",
-                f"Too many strings ({len(lines)}). Maximum is 2000. "
-                "Please reduce the number of lines."
+                f"Too many strings ({len(lines)}). Maximum is {MAX_TEXT_LINES} "
+                "in the text box. Use 'Load from File' for larger batches."
             )
             return
 
@@ -425,31 +434,7 @@ class QRGeneratorApp:
 
         self.strings_list = lines
         self.current_index = 0
-
-        try:
-            self.current_qr_image = self._build_qr_image(self.strings_list[0], target_w, target_h)
-            self._update_preview()
-
-            # Enable save and copy buttons
-            self.save_btn.configure(state=tk.NORMAL)
-            self.copy_btn.configure(state=tk.NORMAL)
-
-            # Enable export ZIP
-            self.export_zip_btn.configure(state=tk.NORMAL)
-
-            # Update navigation
-            self._update_nav_state()
-
-            # Update status
-            n = len(self.strings_list)
-            if n == 1:
-                char_count = len(self.strings_list[0])
-                self.status_var.set(f"QR code generated successfully! ({char_count} characters)")
-            else:
-                self.status_var.set(f"Showing 1 / {n}")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate QR code:\n{str(e)}")
+        self._request_preview(target_w, target_h)
 
     def _update_nav_state(self):
         """Update navigation buttons and label based on current state."""
@@ -467,64 +452,121 @@ class QRGeneratorApp:
                 state=tk.NORMAL if self.current_index < n - 1 else tk.DISABLED
             )
 
-    def _show_prev(self):
-        if self.current_index > 0:
-            self.current_index -= 1
-            try:
-                target_w, target_h = self._get_output_dimensions()
-                self.current_qr_image = self._build_qr_image(
-                    self.strings_list[self.current_index], target_w, target_h
-                )
-                self._update_preview()
-                self._update_nav_state()
-                n = len(self.strings_list)
+    def _request_preview(self, target_w, target_h):
+        """Render the current label in the background and show it when done.
+
+        Settings are snapshotted here, on the Tk thread.  A newer request
+        (e.g. clicking Next again) supersedes this one.  The artifact store is
+        checked first, and afterwards the neighbouring labels are prefetched.
+        """
+        try:
+            settings = self._get_settings()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        context = (settings, target_w, target_h)
+        strings = self.strings_list
+        index = self.current_index
+        text = strings[index]
+
+        def job(cancelled):
+            image = self.artifacts.image(index, text, context)
+            if cancelled():
+                return None
+            return image, LabelRenderer(settings).version(text)
+
+        def done(result):
+            self.current_qr_image, version = result
+            self._update_preview()
+
+            # Enable save, copy and export ZIP
+            self.save_btn.configure(state=tk.NORMAL)
+            self.copy_btn.configure(state=tk.NORMAL)
+            self.export_zip_btn.configure(state=tk.NORMAL)
+            self.resume_zip_btn.configure(state=tk.NORMAL)
+
+            n = len(strings)
+            if n == 1:
                 self.status_var.set(
-                    f"Showing {self.current_index + 1} / {n} — "
-                    f"{self.strings_list[self.current_index][:50]}"
+                    f"QR code generated successfully! ({len(text)} characters, "
+                    f"QR version {version})"
                 )
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to generate QR code:\n{str(e)}")
+            else:
+                self.status_var.set(f"Showing {index + 1} / {n} (QR v{version}) — {text[:50]}")
+            self.prefetcher.schedule(strings, index, settings, target_w, target_h)
+
+        def failed(e):
+            self.status_var.set("Rendering failed.")
+            messagebox.showerror("Error", f"Failed to generate QR code:\n{str(e)}")
+
+        self._update_nav_state()
+        self.status_var.set(f"Rendering {index + 1} / {len(strings)}...")
+        self.preview_worker.submit(job, done, failed)
+
+    def _show_index(self, index):
+        try:
+            target_w, target_h = self._get_output_dimensions()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.current_index = index
+        self._request_preview(target_w, target_h)
+
+    def _show_prev(self):
+        if self.current_index > 0:
+            self._show_index(self.current_index - 1)
 
     def _show_next(self):
         if self.current_index < len(self.strings_list) - 1:
-            self.current_index += 1
-            try:
-                target_w, target_h = self._get_output_dimensions()
-                self.current_qr_image = self._build_qr_image(
-                    self.strings_list[self.current_index], target_w, target_h
-                )
-                self._update_preview()
-                self._update_nav_state()
-                n = len(self.strings_list)
-                self.status_var.set(
-                    f"Showing {self.current_index + 1} / {n} — "
-                    f"{self.strings_list[self.current_index][:50]}"
-                )
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to generate QR code:\n{str(e)}")
+            self._show_index(self.current_index + 1)
+
+    def _resume_export(self):
+        checkpoint = latest_checkpoint(OUTPUT_DIR)
+        if checkpoint is None:
+            messagebox.showinfo("Resume Export", "There is no interrupted export to resume.")
+            return
+        state = read_checkpoint(checkpoint)
+        if not messagebox.askyesno(
+            "Resume Export",
+            f"Continue {state['archive']} ({state['completed']} of {state['labels']} "
+            f"label(s) done, {state['format']})?\n\n"
+            "The loaded labels and design settings must be the ones it was started with."
+        ):
+            return
+        self._export_all_zip(checkpoint)
 
-    def _export_all_zip(self):
+    def _export_all_zip(self, checkpoint=None):
         if not self.strings_list:
             messagebox.showwarning("Warning", "No QR codes to export. Generate first.")
             return
 
         try:
             target_w, target_h = self._get_output_dimensions()
+            settings = self._get_settings()
+            workers = self._get_workers()
+            max_bytes, max_labels = self._get_volume_limits()
+            pipeline = ExportPipeline(self._get_pipeline_memory())
         except ValueError as e:
             messagebox.showerror("Error", str(e))
             return
+        cache = self._get_cache()
+        profile = Profile() if self.profile_var.get() else NULL_PROFILE
+        if checkpoint is None:
+            fmt = self.export_format_var.get()
+            previous = latest_export(OUTPUT_DIR) if self.incremental_var.get() else None
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            zip_path = new_export_path(OUTPUT_DIR)
+        else:
+            # Format, volume limits and previous export come from the checkpoint
+            fmt = read_checkpoint(checkpoint)["format"]
 
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_filename = f"qr_export_{timestamp}.zip"
-        zip_path = os.path.join(OUTPUT_DIR, zip_filename)
-
-        total = len(self.strings_list)
+        strings = self.strings_list
+        total = len(strings)
 
         # Create progress window
         progress_win = tk.Toplevel(self.root)
         progress_win.title("Exporting QR Codes")
-        progress_win.geometry("350x130")
+        progress_win.geometry("460x190")
         progress_win.resizable(False, False)
         progress_win.transient(self.root)
         progress_win.grab_set()
@@ -544,7 +586,21 @@ class QRGeneratorApp:
         progress_label_var = tk.StringVar(value=f"0 / {total}")
         ttk.Label(progress_win, textvariable=progress_label_var).pack()
 
+        rate_var = tk.StringVar(value="")
+        ttk.Label(progress_win, textvariable=rate_var, font=("Segoe UI", 8)).pack()
+
+        # Per-stage queue depths show which stage holds the export up
+        depth_var = tk.StringVar(value="")
+        ttk.Label(
+            progress_win, textvariable=depth_var, font=("Segoe UI", 8), wraplength=430
+        ).pack()
+        start_time = time.perf_counter()
+
         cancel_flag = threading.Event()
+        versions = Counter()
+        result = None
+        exported = 0  # written by the export thread, drawn by _refresh_progress
+        finished = False
 
         def on_cancel():
             cancel_flag.set()
@@ -552,63 +608,99 @@ class QRGeneratorApp:
         cancel_btn = ttk.Button(progress_win, text="Cancel", command=on_cancel)
         cancel_btn.pack(pady=(5, 10))
 
+        def on_progress(count):
+            nonlocal exported
+            exported = count
+
         def export_thread():
+            nonlocal result
             try:
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                    for i, text in enumerate(self.strings_list):
-                        if cancel_flag.is_set():
-                            break
-
-                        img = self._build_qr_image(text, target_w, target_h)
-                        buf = io.BytesIO()
-                        img.save(buf, format="PNG", dpi=(OUTPUT_DPI, OUTPUT_DPI))
-                        entry_name = f"qr_{i + 1:04d}.png"
-                        zf.writestr(entry_name, buf.getvalue())
-
-                        # Update progress on the main thread
-                        self.root.after(0, lambda idx=i: _update_progress(idx + 1))
-
-                if cancel_flag.is_set():
-                    # Clean up partial zip
-                    try:
-                        os.remove(zip_path)
-                    except OSError:
-                        pass
+                # Labels already rendered for the preview are not rendered again;
+                # read-only, so changing the settings meanwhile keeps the preview
+                context = (settings, target_w, target_h)
+                known = {}
+                for index, text in self.artifacts.rendered(context):
+                    data = self.artifacts.stored_encoding(index, text, context, fmt)
+                    if data is not None:
+                        known[index] = (text, data)
+                if checkpoint is None:
+                    result = export_archive(
+                        zip_path, strings, settings, target_w, target_h, fmt,
+                        previous=previous, workers=workers, cancel=cancel_flag, cache=cache,
+                        profile=profile, versions=versions, progress=on_progress,
+                        known=known, max_bytes=max_bytes, max_labels=max_labels,
+                        checkpoint=True, pipeline=pipeline,
+                    )
+                else:
+                    result = resume_export(
+                        checkpoint, strings, settings, target_w, target_h, workers=workers,
+                        cancel=cancel_flag, cache=cache, profile=profile, versions=versions,
+                        progress=on_progress, known=known, pipeline=pipeline,
+                    )
+
+                if result.cancelled:
+                    # Partial archives stay, with a checkpoint, for "Resume Export"
                     self.root.after(0, lambda: _finish_cancelled())
                 else:
                     self.root.after(0, lambda: _finish_success())
 
             except Exception as e:
-                # Clean up on error
-                try:
-                    os.remove(zip_path)
-                except OSError:
-                    pass
                 self.root.after(0, lambda err=str(e): _finish_error(err))
 
-        def _update_progress(count):
-            progress_var.set(count)
-            progress_label_var.set(f"{count} / {total}")
+        def _refresh_progress():
+            # Coalesced: redraw at a fixed rate instead of once per label
+            if finished:
+                return
+            progress_var.set(exported)
+            progress_label_var.set(f"{exported} / {total}")
+            elapsed = time.perf_counter() - start_time
+            if elapsed > 0:
+                rate_var.set(f"{exported / elapsed:.1f} labels/s")
+            depth_var.set(pipeline.depth_summary())
+            self.root.after(PROGRESS_REFRESH_MS, _refresh_progress)
 
         def _finish_success():
+            nonlocal finished
+            finished = True
             progress_win.destroy()
-            abs_path = os.path.abspath(zip_path)
-            self.status_var.set(f"Exported {total} QR codes to {zip_filename}")
-            messagebox.showinfo(
-                "Export Complete",
-                f"Successfully exported {total} QR code(s) to:\n{abs_path}"
+            names = [os.path.basename(path) for path in result.paths]
+            per_label = result.bytes / max(1, total) / 1024
+            self.status_var.set(
+                f"Exported {total} QR codes to {', '.join(names)} ({per_label:.1f} KB/label, "
+                f"{result.summary()})"
             )
+            location = "\n".join(os.path.abspath(path) for path in result.paths)
+            message = (
+                f"Successfully exported {total} QR code(s) to:\n{location}\n"
+                f"Average size: {per_label:.1f} KB per label\n"
+                f"{result.summary().capitalize()}"
+            )
+            if versions:
+                message += f"\nQR versions: {version_summary(versions)}"
+            if cache is not None:
+                message += f"\n\n{cache.report()}"
+            if profile.enabled:
+                message += f"\n\n{profile.summary()}"
+            messagebox.showinfo("Export Complete", message)
 
         def _finish_cancelled():
+            nonlocal finished
+            finished = True
             progress_win.destroy()
-            self.status_var.set("Export cancelled.")
+            self.status_var.set("Export cancelled. Use Resume Export to continue it.")
 
         def _finish_error(err):
+            nonlocal finished
+            finished = True
             progress_win.destroy()
-            messagebox.showerror("Export Error", f"Failed to export:\n{err}")
+            message = f"Failed to export:\n{err}"
+            if latest_checkpoint(OUTPUT_DIR) is not None:
+                message += "\n\nWhat was written so far is kept; use Resume Export to continue."
+            messagebox.showerror("Export Error", message)
 
         thread = threading.Thread(target=export_thread, daemon=True)
         thread.start()
+        _refresh_progress()
 
     def _load_from_file(self):
         filepath = filedialog.askopenfilename(
@@ -621,14 +713,45 @@ class QRGeneratorApp:
         )
         if filepath:
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.text_input.delete("1.0", tk.END)
-                self.text_input.insert("1.0", content)
-                line_count = len([l for l in content.splitlines() if l.strip()])
-                self.status_var.set(f"Loaded {line_count} line(s) from {os.path.basename(filepath)}")
+                batch = FileBatch(filepath)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load file:\n{str(e)}")
+                return
+
+            if self.file_batch is not None:
+                self.clear_all()
+            name = os.path.basename(filepath)
+            self.text_input.configure(state=tk.NORMAL)
+            self.text_input.delete("1.0", tk.END)
+
+            if len(batch) <= MAX_TEXT_LINES:
+                # Small files stay editable in the text box
+                self.text_input.insert("1.0", "\n".join(batch))
+                batch.close()
+            else:
+                # Large files stay on disk and are read on demand
+                self.file_batch = batch
+                preview = "\n".join(batch[:20])
+                self.text_input.insert(
+                    "1.0",
+                    f"{preview}\n...\n\n[{len(batch)} lines kept on disk: {name}. "
+                    "Press Clear to edit text manually.]"
+                )
+                self.text_input.configure(state=tk.DISABLED)
+            self.status_var.set(f"Loaded {len(batch)} line(s) from {name}")
+
+    def _release_file_batch(self):
+        """Forget the current file-backed batch and close its file."""
+        if self.file_batch is None:
+            return
+        self.prefetcher.cancel()
+        self.preview_worker.cancel()
+        self.artifacts.clear()
+        if self.strings_list is self.file_batch:
+            self.strings_list = []
+            self.current_qr_image = None
+        self.file_batch.close()
+        self.file_batch = None
 
     def _get_output_dimensions(self):
         """Parse and validate width/height inputs, return (width_px, height_px)."""
@@ -638,29 +761,46 @@ class QRGeneratorApp:
         except ValueError:
             raise ValueError("Width and Height must be valid numbers.")
 
-        if width_val <= 0 or height_val <= 0:
-            raise ValueError("Width and Height must be positive values.")
-
-        unit = self.unit_var.get()
-        if unit == "cm":
-            target_w = max(1, int(width_val * CM_TO_PX))
-            target_h = max(1, int(height_val * CM_TO_PX))
-        elif unit == "in":
-            target_w = max(1, int(width_val * IN_TO_PX))
-            target_h = max(1, int(height_val * IN_TO_PX))
-        else:  # px
-            target_w = max(1, int(width_val))
-            target_h = max(1, int(height_val))
-        return target_w, target_h
-
-    def _get_output_image(self):
-        """Build output image at the target dimensions."""
-        if not self.strings_list:
-            return None
+        return target_pixels(width_val, height_val, self.unit_var.get())
 
-        text = self.strings_list[self.current_index]
-        target_w, target_h = self._get_output_dimensions()
-        return self._build_qr_image(text, target_w, target_h)
+    def _get_workers(self):
+        """Return the number of export worker processes (1 = no pool)."""
+        try:
+            workers = self.workers_var.get()
+        except tk.TclError:
+            raise ValueError("Workers must be a whole number.")
+        if workers < 1:
+            raise ValueError("Workers must be at least 1.")
+        return workers
+
+    def _get_volume_limits(self):
+        """Return (max_bytes, max_labels) per export ZIP; None means no limit."""
+        try:
+            megabytes = self.volume_mb_var.get()
+            labels = self.volume_labels_var.get()
+        except tk.TclError:
+            raise ValueError("Split ZIP size and labels per ZIP must be whole numbers.")
+        if megabytes < 0 or labels < 0:
+            raise ValueError("Split ZIP size and labels per ZIP cannot be negative.")
+        return (megabytes * 1024 * 1024 or None), (labels or None)
+
+    def _get_pipeline_memory(self):
+        """Return the export's peak-memory target for labels in flight, in bytes."""
+        try:
+            megabytes = self.memory_mb_var.get()
+        except tk.TclError:
+            raise ValueError("Memory must be a whole number of MB.")
+        if megabytes < 1:
+            raise ValueError("Memory must be at least 1 MB.")
+        return megabytes * 1024 * 1024
+
+    def _get_cache(self):
+        """Return the shared RenderCache, or None if caching is turned off."""
+        if not self.use_cache_var.get():
+            return None
+        if self.render_cache is None:
+            self.render_cache = RenderCache()
+        return self.render_cache
 
     def _update_preview(self):
         if self.current_qr_image is None:
@@ -674,6 +814,8 @@ class QRGeneratorApp:
             return
 
         img = self.current_qr_image
+        if img.mode in ("1", "P"):
+            img = img.convert("L")  # LANCZOS needs a continuous-tone image
         ratio = min(canvas_w / img.width, canvas_h / img.height)
 
         # Don't upscale beyond original size
@@ -707,23 +849,54 @@ class QRGeneratorApp:
             filetypes=[
                 ("PNG files", "*.png"),
                 ("JPEG files", "*.jpg"),
+                ("SVG files", "*.svg"),
+                ("PDF files", "*.pdf"),
                 ("All files", "*.*")
             ],
             initialdir=OUTPUT_DIR,
             initialfile="qr_code.png"
         )
 
-        if filepath:
-            try:
-                output_image = self._get_output_image()
-                os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
-                output_image.save(filepath, dpi=(OUTPUT_DPI, OUTPUT_DPI))
-                self.status_var.set(f"Saved: {filepath}")
-                messagebox.showinfo("Success", f"QR code saved to:\n{filepath}")
-            except ValueError as e:
-                messagebox.showerror("Error", str(e))
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save:\n{str(e)}")
+        if not filepath:
+            return
+        try:
+            fmt = format_for_path(filepath)
+            target_w, target_h = self._get_output_dimensions()
+            settings = self._get_settings()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        context = (settings, target_w, target_h)
+        index = self.current_index
+        text = self.strings_list[index]
+        cache = self._get_cache()
+
+        def job(cancelled):
+            if cache is not None and not self.artifacts.has(index, text, context):
+                data = encode_one(settings, text, target_w, target_h, fmt, cache=cache)
+            else:
+                data = self.artifacts.encoded(index, text, context, fmt)
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+            with open(filepath, "wb") as f:
+                f.write(data)
+
+        def done(_):
+            self.status_var.set(f"Saved: {filepath}")
+            note = ""
+            if fmt == "PDF" and settings.font in PDF_FONTS:
+                # PDFs use the standard fonts rather than embedding the TTF
+                note = (
+                    f"\n\nThe caption uses {PDF_FONTS[settings.font]} "
+                    f"in place of {settings.font}."
+                )
+            messagebox.showinfo("Success", f"QR code saved to:\n{filepath}{note}")
+
+        def failed(e):
+            self.status_var.set("Save failed.")
+            messagebox.showerror("Error", f"Failed to save:\n{str(e)}")
+
+        self.status_var.set(f"Saving {os.path.basename(filepath)}...")
+        self.save_worker.submit(job, done, failed)
 
     def copy_to_clipboard(self):
         if self.current_qr_image is None:
@@ -731,35 +904,53 @@ class QRGeneratorApp:
             return
 
         try:
-            output_image = self._get_output_image()
-
-            # Convert image to BMP format for Windows clipboard
-            output = io.BytesIO()
-            # Convert to RGB if necessary and save as BMP
-            image = output_image.convert("RGB")
-            image.save(output, format="BMP")
-            bmp_data = output.getvalue()[14:]  # Remove BMP file header
+            target_w, target_h = self._get_output_dimensions()
+            settings = self._get_settings()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        context = (settings, target_w, target_h)
+        index = self.current_index
+        text = self.strings_list[index]
 
-            # Copy to clipboard
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_DIB, bmp_data)
-            win32clipboard.CloseClipboard()
+        def job(cancelled):
+            # Headerless bitmap for the Windows clipboard, kept with the label
+            return self.artifacts.encoded(index, text, context, "DIB")
 
+        def done(bmp_data):
+            try:
+                win32clipboard.OpenClipboard()
+                win32clipboard.EmptyClipboard()
+                win32clipboard.SetClipboardData(win32clipboard.CF_DIB, bmp_data)
+                win32clipboard.CloseClipboard()
+            except Exception as e:
+                failed(e)
+                return
             self.status_var.set("QR code copied to clipboard!")
 
-        except Exception as e:
+        def failed(e):
+            self.status_var.set("Copy failed.")
             messagebox.showerror("Error", f"Failed to copy to clipboard:\n{str(e)}")
 
+        self.status_var.set("Copying to clipboard...")
+        self.copy_worker.submit(job, done, failed)
+
     def clear_all(self):
+        self._release_file_batch()
+        self.text_input.configure(state=tk.NORMAL)
         self.text_input.delete("1.0", tk.END)
         self.qr_canvas.delete("all")
         self.current_qr_image = None
         self.strings_list = []
         self.current_index = 0
+        self.prefetcher.cancel()
+        self.preview_worker.cancel()
+        self.copy_worker.cancel()
+        self.artifacts.clear()
         self.save_btn.configure(state=tk.DISABLED)
         self.copy_btn.configure(state=tk.DISABLED)
         self.export_zip_btn.configure(state=tk.DISABLED)
+        self.resume_zip_btn.configure(state=tk.DISABLED)
         self.prev_btn.configure(state=tk.DISABLED)
         self.next_btn.configure(state=tk.DISABLED)
         self.nav_label_var.set("")
@@ -0,0 +1,357 @@
+"""Staged export pipeline with bounded queues and a memory ceiling.
+
+An export runs as five stages, each on its own thread: read payloads,
+encode QR codes (and lay the labels out), compose the rasters, encode
+the images, and write (the caller, consuming ``ExportPipeline.run``).
+Stages hand chunks of labels to each other through bounded queues, so
+a fast stage blocks instead of piling up full-resolution images behind
+a slow one.  On top of that, the read stage only admits a label once
+the number in flight is below ``max_labels``: the peak-memory target
+divided by an estimate of what one label holds (its canvas and its
+encoding).  With several workers, the encode, compose and image-encode
+stages run together in a process pool instead.
+
+With ``writers=True``, ``run`` yields ``(write(fp), size)`` per label,
+and raster labels rendered in this process (one worker, no cache) are
+encoded by the write stage straight into *fp*, e.g. an open ZIP entry,
+without an intermediate buffer (their size is None until then).
+
+``depths()`` reports, per stage, the labels waiting in its input queue
+and the labels it is working on; the stage whose queue stays full is the
+bottleneck.
+"""
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from qr_cache import cache_key, settings_digest
+from qr_export import (
+    CHUNK_SIZE, CHUNKS_PER_WORKER, VECTOR_WRITERS, _chunks, _encode_chunk, _init_worker,
+    encode_image,
+)
+from qr_profile import NULL_PROFILE
+from qr_render import LabelRenderer
+
+PIPELINE_MEMORY = 256 * 1024 * 1024  # default peak-memory target for labels in flight
+QUEUE_CHUNKS = 2                     # chunks a stage's input queue holds
+BARE_CODE_PX = 650                   # side of a version 10 code at 10 px per module
+
+_POLL = 0.1  # seconds between checks for a stopped pipeline while blocked
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """Raised in a stage thread once the pipeline is shut down."""
+
+
+class _Batch:
+    """A chunk of labels on its way through the stages.
+
+    ``items`` holds, per label, its payload, then its layout, image and
+    finally its encoded bytes; labels served from the cache are bytes from
+    the start and pass the later stages untouched.  With a process pool,
+    ``future`` renders the payloads that are still strings.
+    """
+    __slots__ = ("items", "keys", "future")
+
+    def __init__(self, texts):
+        self.items = list(texts)
+        self.keys = None
+        self.future = None
+
+
+def label_nbytes(settings, target_w, target_h, fmt="PNG"):
+    """Rough peak memory of one label in flight: its canvas and its encoding."""
+    if target_w is None or target_h is None:
+        canvas = BARE_CODE_PX * BARE_CODE_PX  # bare codes are 1-bit, a byte per pixel
+    else:
+        # RGB is stored as 32 bits; mono/gray4 are composed in L, then converted
+        canvas = target_w * target_h * (4 if settings.color_mode == "RGB" else 2)
+    return canvas if fmt in VECTOR_WRITERS else 2 * canvas
+
+
+def _write_bytes(data, fp):
+    fp.write(data)
+
+
+def _write_image(renderer, img, fmt, fp):
+    with renderer.profile.stage("image_encode"):
+        encode_image(img, fmt, renderer.settings, fp)
+
+
+class ExportPipeline:
+    """Render labels through bounded stages; reusable for one run at a time.
+
+    *memory* is the peak-memory target (bytes) for labels in flight.
+    ``run()`` yields encoded bytes in input order.
+    """
+
+    def __init__(self, memory=PIPELINE_MEMORY):
+        self.memory = memory
+        self.max_labels = 1
+        self.in_flight = 0
+        self._queues = {}     # stage -> its bounded input queue
+        self._load = {}       # stage -> [labels queued, labels being worked on]
+        self._space = threading.Condition()
+        self._stop = threading.Event()
+        self._error = None
+
+    def depths(self):
+        """[(stage, labels queued, labels in work), ...] for the current run."""
+        with self._space:
+            return [(name, queued, working) for name, (queued, working) in self._load.items()]
+
+    def depth_summary(self):
+        """One line for progress displays, e.g. ``"12/59 in flight, queued/in work: ..."``."""
+        depths = self.depths()
+        if not depths:
+            return ""
+        stages = ", ".join(f"{name} {queued}/{working}" for name, queued, working in depths)
+        return f"{self.in_flight}/{self.max_labels} labels in flight, queued/in work: {stages}"
+
+    def run(self, texts, settings, target_w, target_h, fmt="PNG", workers=1, cancel=None,
+            cache=None, profile=None, versions=None, writers=False):
+        """Yield the encoded bytes of every label in *texts*, in input order.
+
+        *texts* is read on the pipeline's read thread, so it may be lazy
+        but must not be consumed elsewhere at the same time.  With
+        ``workers > 1`` labels are rendered by a process pool.  When a
+        ``RenderCache`` is given, hits are served from disk and only misses
+        are rendered.  Iteration stops early once *cancel* (a
+        ``threading.Event``) is set.  Stage timings (including those
+        measured in worker processes) are added to *profile* if given, and
+        the QR version of every rendered label to the *versions* Counter.
+        With *writers*, ``(write(fp), size)`` is yielded per label instead
+        of its bytes (see the module docstring).
+        """
+        profile = profile or NULL_PROFILE
+        digest = settings_digest(settings, target_w, target_h, fmt) if cache else None
+
+        def lookup(batch):
+            if cache is None:
+                return
+            with profile.stage("cache_lookup"):
+                batch.keys = [cache_key(text, digest) for text in batch.items]
+                for i, key in enumerate(batch.keys):
+                    data = cache.get(key)
+                    if data is not None:
+                        batch.items[i] = data
+
+        pool = None
+        if workers <= 1:
+            renderer = LabelRenderer(settings, profile=profile, versions=versions)
+
+            def encode(batch):
+                lookup(batch)
+                self._encode(renderer, batch, target_w, target_h)
+
+            stages = {
+                "encode": encode,
+                "compose": lambda batch: self._compose(renderer, batch, target_w, target_h, fmt),
+            }
+            # Encoded in the write stage, straight into the caller's file
+            deferred = writers and cache is None and fmt not in VECTOR_WRITERS
+            if not deferred:
+                stages["image_encode"] = (
+                    lambda batch: self._image_encode(renderer, batch, fmt, cache)
+                )
+            capacity = {name: QUEUE_CHUNKS for name in (*stages, "write")}
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(settings, target_w, target_h, fmt, profile.enabled,
+                          versions is not None),
+            )
+
+            def submit(batch):
+                lookup(batch)
+                misses = [text for text in batch.items if isinstance(text, str)]
+                if misses:
+                    batch.future = pool.submit(_encode_chunk, misses)
+
+            # encode, compose and image encode all happen in the worker processes
+            stages = {"render": submit}
+            capacity = {"render": QUEUE_CHUNKS, "write": workers * CHUNKS_PER_WORKER}
+
+        # Small enough chunks that every stage can hold one within the ceiling
+        self.max_labels = max(1, self.memory // label_nbytes(settings, target_w, target_h, fmt))
+        chunk_size = max(1, min(CHUNK_SIZE, self.max_labels // sum(capacity.values())))
+        self.in_flight = 0
+        self._stop.clear()
+        self._error = None
+        self._queues = {name: queue.Queue(size) for name, size in capacity.items()}
+        self._load = {name: [0, 0] for name in capacity}
+
+        names = list(capacity)
+        threads = [threading.Thread(
+            target=self._read, args=(texts, chunk_size, names[0]), daemon=True
+        )]
+        for name, sink in zip(names, names[1:]):
+            threads.append(threading.Thread(
+                target=self._stage, args=(name, stages[name], sink), daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                batch = self._get("write")
+                if batch is _DONE:
+                    return
+                if batch.future is not None:
+                    self._collect(batch, cache, profile, versions)
+                for data in batch.items:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    self._release(1)
+                    if not writers:
+                        yield data
+                    elif isinstance(data, bytes):
+                        yield partial(_write_bytes, data), len(data)
+                    else:
+                        yield partial(_write_image, renderer, data, fmt), None
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            self._queues = {}
+            self._load = {}
+
+    # --- Stages ---------------------------------------------------------
+
+    def _read(self, texts, chunk_size, sink):
+        try:
+            for chunk in _chunks(texts, chunk_size):
+                self._acquire(len(chunk))
+                self._put(sink, _Batch(chunk))
+            self._put(sink, _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _stage(self, name, work, sink):
+        try:
+            while True:
+                batch = self._get(name)
+                if batch is not _DONE:
+                    work(batch)
+                self._put(sink, batch)
+                self._done(name)
+                if batch is _DONE:
+                    return
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    @staticmethod
+    def _encode(renderer, batch, target_w, target_h):
+        bare = target_w is None or target_h is None
+        for i, text in enumerate(batch.items):
+            if isinstance(text, str):
+                batch.items[i] = (
+                    renderer.code_layout(text) if bare
+                    else renderer.layout(text, target_w, target_h)
+                )
+
+    @staticmethod
+    def _compose(renderer, batch, target_w, target_h, fmt):
+        if fmt in VECTOR_WRITERS:
+            return  # vectors are written from the layout
+        todo = [i for i, item in enumerate(batch.items) if not isinstance(item, bytes)]
+        layouts = [batch.items[i] for i in todo]
+        if target_w is None or target_h is None:
+            images = renderer.rasterize_codes(layouts)
+        else:
+            images = renderer.rasterize_many(layouts)
+        for i, img in zip(todo, images):
+            batch.items[i] = img
+
+    @staticmethod
+    def _image_encode(renderer, batch, fmt, cache):
+        for i, item in enumerate(batch.items):
+            if isinstance(item, bytes):
+                continue
+            if fmt in VECTOR_WRITERS:
+                with renderer.profile.stage("vector_encode"):
+                    batch.items[i] = VECTOR_WRITERS[fmt](item)
+            else:
+                with renderer.profile.stage("image_encode"):
+                    batch.items[i] = encode_image(item, fmt, renderer.settings)
+            if cache is not None:
+                cache.put(batch.keys[i], batch.items[i])
+
+    @staticmethod
+    def _collect(batch, cache, profile, versions):
+        with profile.stage("pool_wait"):
+            results, timings, rendered_versions = batch.future.result()
+        if timings:
+            profile.merge(timings)
+        if rendered_versions:
+            versions.update(rendered_versions)
+        rendered = iter(results)
+        for i, item in enumerate(batch.items):
+            if isinstance(item, str):
+                batch.items[i] = next(rendered)
+                if cache is not None:
+                    cache.put(batch.keys[i], batch.items[i])
+
+    # --- Flow control ---------------------------------------------------
+
+    def _acquire(self, count):
+        with self._space:
+            while self.in_flight + count > self.max_labels:
+                if self._stop.is_set():
+                    raise _Stopped()
+                self._space.wait(_POLL)
+            self.in_flight += count
+
+    def _release(self, count):
+        with self._space:
+            self.in_flight -= count
+            self._load["write"][1] -= count
+            self._space.notify()
+
+    def _put(self, name, item):
+        """Queue *item* for stage *name*, blocking while its queue is full."""
+        while True:
+            try:
+                self._queues[name].put(item, timeout=_POLL)
+                break
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Stopped()
+        if item is not _DONE:
+            with self._space:
+                self._load[name][0] += len(item.items)
+
+    def _get(self, name):
+        """Take the next item from stage *name*'s queue and count it as in work."""
+        while True:
+            try:
+                item = self._queues[name].get(timeout=_POLL)
+                break
+            except queue.Empty:
+                if self._error is not None:
+                    raise self._error
+                if self._stop.is_set():
+                    raise _Stopped()
+        if item is not _DONE:
+            with self._space:
+                load = self._load[name]
+                load[0] -= len(item.items)
+                load[1] = len(item.items)
+        return item
+
+    def _done(self, name):
+        with self._space:
+            self._load[name][1] = 0
+
+    def _fail(self, error):
+        self._error = error
+        self._stop.set()
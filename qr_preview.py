@@ -0,0 +1,276 @@
+"""Label artifact store, background prefetcher and render worker for the GUI.
+
+The GUI renders through ``RenderWorker`` so the Tk thread never blocks.
+Every rendered label is kept in an ``ArtifactStore`` together with the
+encodings made from it (PNG, JPEG, clipboard DIB, ...), so preview, save,
+copy and export render a label at most once per settings change.  A
+single background thread renders the entries around the current one so
+that Prev/Next usually hit the store.  Nothing in this module touches Tk.
+"""
+import threading
+from collections import OrderedDict
+
+from qr_export import VECTOR_WRITERS, encode_image, encode_label
+from qr_render import LabelRenderer
+
+ARTIFACT_BUDGET = 256 * 1024 * 1024  # bytes of images and encodings kept in memory
+PREFETCH_RADIUS = 3                  # labels rendered ahead of and behind the current one
+
+
+def image_nbytes(img):
+    """Approximate memory held by a Pillow image (RGB is stored as 32 bits)."""
+    return img.width * img.height * (1 if img.mode in ("1", "L", "P") else 4)
+
+
+class LabelArtifacts:
+    """A rendered label and the encodings made from it so far."""
+
+    def __init__(self, image):
+        self.image = image
+        self.encodings = {}
+        self.nbytes = image_nbytes(image)
+
+
+class ArtifactStore:
+    """Rendered labels and their encodings keyed by (index, text).
+
+    Every entry belongs to one render context (settings snapshot and target
+    size); switching to a different context drops all entries.  Least
+    recently used entries are evicted once images plus encodings exceed
+    *budget* bytes (the newest entry is always kept).
+    """
+
+    def __init__(self, budget=ARTIFACT_BUDGET):
+        self.budget = budget
+        self.nbytes = 0
+        self._context = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_context(self, context):
+        if context != self._context:
+            self._context = context
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.budget and len(self._entries) > 1:
+            _, artifacts = self._entries.popitem(last=False)
+            self.nbytes -= artifacts.nbytes
+
+    def _lookup(self, index, text, context):
+        self._check_context(context)
+        artifacts = self._entries.get((index, text))
+        if artifacts is not None:
+            self._entries.move_to_end((index, text))
+        return artifacts
+
+    def get(self, index, text, context):
+        """Return the rendered image of a label, or None."""
+        with self._lock:
+            artifacts = self._lookup(index, text, context)
+            return None if artifacts is None else artifacts.image
+
+    def put(self, index, text, context, image):
+        with self._lock:
+            if context != self._context:
+                return  # rendered for settings that are no longer current
+            old = self._entries.pop((index, text), None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            artifacts = self._entries[(index, text)] = LabelArtifacts(image)
+            self.nbytes += artifacts.nbytes
+            self._evict()
+
+    def has(self, index, text, context):
+        """Like ``get`` but never switches context (safe for the prefetcher)."""
+        with self._lock:
+            return context == self._context and (index, text) in self._entries
+
+    def image(self, index, text, context):
+        """Return the label's image, rendering and storing it if needed."""
+        image = self.get(index, text, context)
+        if image is None:
+            settings, target_w, target_h = context
+            image = LabelRenderer(settings).render(text, target_w, target_h)
+            self.put(index, text, context, image)
+        return image
+
+    def encoded(self, index, text, context, fmt):
+        """Return the label encoded as *fmt* (any export format, or "DIB").
+
+        Raster encodings are made from the stored image, so the label is
+        only rendered if it is not in the store yet; vector formats are
+        written from the layout.  The result is kept with the image.
+        """
+        with self._lock:
+            artifacts = self._lookup(index, text, context)
+            if artifacts is not None and fmt in artifacts.encodings:
+                return artifacts.encodings[fmt]
+
+        settings, target_w, target_h = context
+        if fmt in VECTOR_WRITERS:
+            data = encode_label(LabelRenderer(settings), text, target_w, target_h, fmt)
+        else:
+            data = encode_image(self.image(index, text, context), fmt, settings)
+        self._keep(index, text, context, fmt, data)
+        return data
+
+    def stored_encoding(self, index, text, context, fmt):
+        """Like ``encoded``, but only for a label already stored for *context*.
+
+        Returns None otherwise.  Never switches context or renders a
+        missing label, so other threads (e.g. an export running while the
+        settings change) can use it without disturbing the preview.
+        """
+        with self._lock:
+            artifacts = (
+                self._entries.get((index, text)) if context == self._context else None
+            )
+            if artifacts is None:
+                return None
+            if fmt in artifacts.encodings:
+                return artifacts.encodings[fmt]
+            image = artifacts.image
+
+        settings, target_w, target_h = context
+        if fmt in VECTOR_WRITERS:
+            data = encode_label(LabelRenderer(settings), text, target_w, target_h, fmt)
+        else:
+            data = encode_image(image, fmt, settings)
+        self._keep(index, text, context, fmt, data)
+        return data
+
+    def _keep(self, index, text, context, fmt, data):
+        """Store an encoding with its label if the label is still stored for *context*."""
+        with self._lock:
+            artifacts = self._entries.get((index, text)) if context == self._context else None
+            if artifacts is not None and fmt not in artifacts.encodings:
+                artifacts.encodings[fmt] = data
+                artifacts.nbytes += len(data)
+                self.nbytes += len(data)
+                self._evict()
+
+    def rendered(self, context):
+        """(index, text) of every label currently stored for *context*."""
+        with self._lock:
+            return list(self._entries) if context == self._context else []
+
+    def clear(self):
+        with self._lock:
+            self._context = None
+            self._entries.clear()
+            self.nbytes = 0
+
+
+class Prefetcher:
+    """Render the neighbours of the current label on a background thread.
+
+    Each call to ``schedule`` replaces the previous plan; work for a stale
+    plan is abandoned between labels.
+    """
+
+    def __init__(self, store, radius=PREFETCH_RADIUS):
+        self.store = store
+        self.radius = radius
+        self._plan = None
+        self._generation = 0
+        self._wakeup = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, strings, index, settings, target_w, target_h):
+        """Prefetch labels around *index* of *strings* for this context."""
+        order = []
+        for step in range(1, self.radius + 1):
+            order.extend((index + step, index - step))
+        order = [i for i in order if 0 <= i < len(strings)]
+
+        with self._wakeup:
+            self._generation += 1
+            self._plan = (self._generation, strings, order, settings, target_w, target_h)
+            self._wakeup.notify()
+
+    def cancel(self):
+        """Drop the current plan, e.g. when the batch is cleared."""
+        with self._wakeup:
+            self._generation += 1
+            self._plan = None
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while self._plan is None:
+                    self._wakeup.wait()
+                generation, strings, order, settings, target_w, target_h = self._plan
+                self._plan = None
+
+            renderer = LabelRenderer(settings)
+            context = (settings, target_w, target_h)
+            for index in order:
+                if generation != self._generation:
+                    break  # superseded by a newer plan
+                try:
+                    text = strings[index]
+                    if self.store.has(index, text, context):
+                        continue
+                    image = renderer.render(text, target_w, target_h)
+                except Exception:
+                    continue  # the GUI reports errors when it renders the label itself
+                self.store.put(index, text, context, image)
+
+
+class RenderWorker:
+    """Run jobs on a background thread, where a newer job supersedes older ones.
+
+    ``submit(job, on_done, on_error)`` calls ``job(cancelled)`` off the
+    caller's thread; ``cancelled()`` turns true once the job is superseded,
+    so long jobs can stop early.  Results of superseded jobs are dropped,
+    and callbacks are handed to *dispatch* (e.g. ``root.after``) so they
+    run on the caller's thread.
+    """
+
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+        self._job = None
+        self._generation = 0
+        self._wakeup = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, job, on_done, on_error=None):
+        with self._wakeup:
+            self._generation += 1
+            self._job = (self._generation, job, on_done, on_error)
+            self._wakeup.notify()
+
+    def cancel(self):
+        """Drop the pending job and the result of the running one."""
+        with self._wakeup:
+            self._generation += 1
+            self._job = None
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while self._job is None:
+                    self._wakeup.wait()
+                generation, job, on_done, on_error = self._job
+                self._job = None
+
+            def cancelled(generation=generation):
+                return generation != self._generation
+
+            try:
+                result = job(cancelled)
+            except Exception as e:
+                if on_error is not None:
+                    self._deliver(generation, on_error, e)
+                continue
+            self._deliver(generation, on_done, result)
+
+    def _deliver(self, generation, callback, value):
+        def deliver():
+            if generation == self._generation:  # not superseded in the meantime
+                callback(value)
+        self.dispatch(deliver)
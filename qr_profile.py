@@ -0,0 +1,127 @@
+"""Optional per-stage timing for label rendering and export.
+
+Hot paths wrap their stages in ``profile.stage(name)``.  When profiling is
+off they get ``NULL_PROFILE``, whose stage is a shared no-op context
+manager, so the cost is a single attribute lookup and call per stage.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, time.perf_counter() - self.start)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profile:
+    """Per-stage call counts and cumulative seconds, plus a label counter."""
+
+    enabled = True
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.labels = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()  # stages may run on several threads
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, seconds, count=1):
+        with self._lock:
+            self.seconds[name] += seconds
+            self.counts[name] += count
+
+    def add_labels(self, count=1):
+        self.labels += count
+
+    def snapshot(self):
+        """Return and clear the stage totals (used to ship worker timings)."""
+        snap = {name: (self.seconds[name], self.counts[name]) for name in self.seconds}
+        self.seconds.clear()
+        self.counts.clear()
+        return snap
+
+    def merge(self, snapshot):
+        for name, (seconds, count) in snapshot.items():
+            self.add(name, seconds, count)
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        busy = sum(self.seconds.values())
+        return {
+            "labels": self.labels,
+            "wall_seconds": round(wall, 4),
+            "labels_per_sec": round(self.labels / wall, 2) if wall > 0 else 0.0,
+            "stages": {
+                name: {
+                    "count": self.counts[name],
+                    "seconds": round(seconds, 4),
+                    "mean_ms": round(seconds / self.counts[name] * 1000, 3),
+                    "share": round(seconds / busy, 4) if busy else 0.0,
+                }
+                for name, seconds in sorted(self.seconds.items(), key=lambda kv: -kv[1])
+            },
+        }
+
+    def summary(self):
+        """Multi-line human readable version of ``report()``."""
+        report = self.report()
+        lines = [f"{report['labels']} labels, {report['labels_per_sec']:.1f} labels/s"]
+        for name, stage in report["stages"].items():
+            lines.append(
+                f"  {name:<14} {stage['seconds']:>8.2f}s  {stage['mean_ms']:>8.2f} ms/call  "
+                f"{stage['share']:>6.1%}"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class _NullProfile:
+    """Stand-in used when profiling is off; every call is a no-op."""
+
+    enabled = False
+    labels = 0
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def add(self, name, seconds, count=1):
+        pass
+
+    def add_labels(self, count=1):
+        pass
+
+    def merge(self, snapshot):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
@@ -0,0 +1,77 @@
+"""Vectorized rasterization of QR module matrices.
+
+A module matrix is expanded to pixels by block repetition: each module is
+repeated as many times as Pillow's NEAREST resize would sample it, so any
+exact target size is supported (not just whole multiples of the module
+count) and the output matches the resize path pixel for pixel.  Pixel
+values are mapped on the small matrix before expansion, and matrices of
+the same version can be stacked and expanded in a single call.
+"""
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+GRAY_LEVELS = np.array([255, 0], dtype=np.uint8)   # light, dark
+
+
+@lru_cache(maxsize=256)
+def block_sizes(modules, size):
+    """Output pixels covered by each of *modules* modules along one axis."""
+    index = ((2 * np.arange(size) + 1) * modules) // (2 * size)
+    counts = np.bincount(index, minlength=modules)
+    counts.flags.writeable = False
+    return counts
+
+
+def module_array(matrices):
+    """Stack one or more module matrices into a boolean array (True = dark)."""
+    return np.asarray(matrices, dtype=bool)
+
+
+def expand(values, size, channels=1):
+    """Expand the last two axes of *values* to *size* x *size* pixels.
+
+    With *channels* > 1 every pixel is repeated that many times along the
+    row, which yields interleaved raw data for gray RGB images.
+    """
+    counts = block_sizes(values.shape[-1], size)
+    # Widen the (short) rows first, then copy whole rows
+    return np.repeat(np.repeat(values, counts * channels, axis=-1), counts, axis=-2)
+
+
+def _pixels(dark, size, mode):
+    """Expanded pixel data and its Pillow raw mode for *mode*."""
+    if mode == "1":
+        # Pillow's 1-bit raw layout is MSB-first packed rows, set bit = white
+        return np.packbits(expand(~dark, size), axis=-1), "1"
+    gray = GRAY_LEVELS[dark.view(np.uint8)]
+    if mode == "RGB":
+        return expand(gray, size, channels=3), "RGB"
+    return expand(gray, size), "L"
+
+
+def _image(pixels, raw_mode, size, mode):
+    img = Image.frombytes(raw_mode, (size, size), pixels.tobytes())
+    return img if img.mode == mode else img.convert(mode)
+
+
+def rasterize(modules, size, mode="L"):
+    """Rasterize one module matrix to a *size* x *size* image in *mode*."""
+    pixels, raw_mode = _pixels(module_array(modules), size, mode)
+    return _image(pixels, raw_mode, size, mode)
+
+
+def rasterize_batch(matrices, size, mode="L"):
+    """Rasterize same-version module matrices to a list of images.
+
+    All matrices must have the same module count; the whole stack is
+    expanded at once and only the final image construction is per code.
+    """
+    if not matrices:
+        return []
+    dark = module_array(matrices)
+    if dark.ndim != 3:
+        raise ValueError("rasterize_batch needs matrices with the same module count.")
+    pixels, raw_mode = _pixels(dark, size, mode)
+    return [_image(p, raw_mode, size, mode) for p in pixels]
@@ -0,0 +1,439 @@
+"""Tk-free label rendering shared by the GUI, the CLI and batch export.
+
+A ``LabelRenderer`` is built from an immutable ``LabelSettings`` snapshot, so
+it can be used from worker threads without touching Tk variables.  Decoded
+and resized logos and loaded fonts live in a bounded, process-wide
+``AssetCache`` and caption layouts in ``qr_text.TEXT_LAYOUT``; the
+per-label cost is just the QR matrix and any caption not seen before.
+"""
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+from qr_profile import NULL_PROFILE
+from qr_raster import rasterize, rasterize_batch
+from qr_segments import optimal_segments
+from qr_text import LINE_SPACING, TEXT_LAYOUT
+
+LOGO_PATH = os.path.join("sources", "Prysmian_Logo_CMYK_Black.png")
+OUTPUT_DPI = 300
+CM_TO_PX = OUTPUT_DPI / 2.54  # ~118.11 pixels per cm
+IN_TO_PX = OUTPUT_DPI          # 300 pixels per inch
+
+FONT_MAP = {
+    "Arial": "arial.ttf",
+    "Times New Roman": "times.ttf",
+    "Verdana": "verdana.ttf",
+}
+
+# Output colour modes: name -> Pillow mode ("P" is a 4-level gray palette)
+COLOR_MODES = {"rgb": "RGB", "mono": "1", "gray4": "P"}
+PALETTE_COLORS = 4
+MONO_THRESHOLD = 128
+GRAY_PALETTE = [
+    channel for i in range(PALETTE_COLORS)
+    for channel in (i * 255 // (PALETTE_COLORS - 1),) * 3
+]
+
+# QR encoding profiles: name -> fixed mask pattern.  "standard" scores all
+# eight masks per payload; "fast" always uses mask 0, which every reader
+# decodes but may leave a few more look-alike patterns in the symbol.
+ENCODING_PROFILES = {"standard": None, "fast": 0}
+
+# Payload segmentation: "optimal" splits numeric/alphanumeric/byte runs for
+# the smallest version, "uppercase" does the same after upper-casing the
+# payload, "qrcode" keeps the library's own split.
+SEGMENT_MODES = ("optimal", "uppercase", "qrcode")
+ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_M
+
+ASSET_CACHE_SIZE = 64
+TEMPLATE_CACHE_SIZE = 8  # compiled templates hold a full-size background each
+
+
+@dataclass(frozen=True)
+class LabelSettings:
+    """Immutable snapshot of the design settings used to build a label."""
+    logo_align: str = "left"
+    qr_align: str = "center"
+    text_align: str = "center"
+    logo_size: int = 400
+    text_size: int = 35
+    font: str = "Arial"
+    logo_path: str = LOGO_PATH
+    color_mode: str = "RGB"
+    png_compress_level: int = 6
+    encoding: str = "standard"
+    segments: str = "optimal"
+
+
+@dataclass
+class LabelLayout:
+    """Pixel geometry of one label, shared by raster and vector output.
+
+    ``modules`` is the QR module matrix including the quiet zone.  Labels
+    without a logo or caption (bare codes) leave those fields empty.
+    """
+    width: int
+    height: int
+    modules: list
+    version: int
+    qr_x: int
+    qr_y: int
+    qr_size: int
+    logo: Optional[Image.Image] = None
+    logo_x: int = 0
+    logo_y: int = 0
+    lines: list = field(default_factory=list)
+    font: object = None
+    font_name: str = ""
+    font_size: int = 0
+    line_spacing: int = 0
+    text_x: int = 0
+    text_y: int = 0
+    template: Optional["LabelTemplate"] = None
+
+
+@dataclass
+class LabelTemplate:
+    """The label-independent part of a layout, compiled once per settings and size.
+
+    Everything except the QR code and the caption is fixed for a batch, so
+    the geometry is computed and the logo alpha-composited onto a
+    ``background`` canvas once; each label starts as a copy of it.
+    """
+    width: int
+    height: int
+    padding: int
+    gap: int
+    content_w: int
+    logo: Image.Image
+    logo_x: int
+    logo_y: int
+    font: object
+    font_key: tuple
+    font_size: int
+    qr_y: int
+    background: Image.Image
+
+
+def target_pixels(width_val, height_val, unit):
+    """Convert a label size in cm, in or px to (width_px, height_px)."""
+    if width_val <= 0 or height_val <= 0:
+        raise ValueError("Width and Height must be positive values.")
+
+    if unit == "cm":
+        return max(1, int(width_val * CM_TO_PX)), max(1, int(height_val * CM_TO_PX))
+    elif unit == "in":
+        return max(1, int(width_val * IN_TO_PX)), max(1, int(height_val * IN_TO_PX))
+    else:  # px
+        return max(1, int(width_val)), max(1, int(height_val))
+
+
+def calc_x(align, canvas_width, element_width, padding):
+    """Calculate horizontal position based on alignment."""
+    if align == "left":
+        return padding
+    elif align == "right":
+        return canvas_width - element_width - padding
+    else:
+        return (canvas_width - element_width) // 2
+
+
+class AssetCache:
+    """Bounded LRU cache of decoded logos and loaded fonts.
+
+    Logos are keyed by (path, width) and fonts by (font file, size).  The
+    cache is shared between renderers, so changing a design setting only
+    loads the assets that actually changed.
+    """
+
+    def __init__(self, max_entries=ASSET_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def logo(self, path, width=None):
+        """Return the RGBA logo at *path*, LANCZOS-resized to *width* if given."""
+        if width is None:
+            return self._get_or_load(
+                ("logo", path, None), lambda: Image.open(path).convert("RGBA")
+            )
+
+        def load():
+            original = self.logo(path)
+            height = max(1, round(width / (original.width / original.height)))
+            return original.resize((width, height), Image.Resampling.LANCZOS)
+
+        return self._get_or_load(("logo", path, width), load)
+
+    def font(self, font_file, size):
+        """Return the TrueType font at *size*, or Pillow's default font."""
+        def load():
+            try:
+                return ImageFont.truetype(font_file, size)
+            except Exception:
+                return ImageFont.load_default()
+
+        return self._get_or_load(("font", font_file, size), load)
+
+    def template(self, settings, width, height, compile):
+        """Return the template for *settings* at *width* x *height*, compiling on a miss."""
+        return self._get_or_load(("template", settings, width, height), compile)
+
+
+ASSET_CACHE = AssetCache()
+TEMPLATE_CACHE = AssetCache(TEMPLATE_CACHE_SIZE)
+
+
+class LabelRenderer:
+    """Render QR labels from a fixed ``LabelSettings`` snapshot."""
+
+    def __init__(self, settings=None, cache=None, profile=None, versions=None,
+                 text_layout=None, templates=None):
+        self.settings = settings or LabelSettings()
+        self.cache = cache or ASSET_CACHE
+        self.templates = templates or TEMPLATE_CACHE
+        self.text_layout = text_layout or TEXT_LAYOUT
+        self.profile = profile or NULL_PROFILE
+        self.versions = versions  # optional Counter of the QR versions encoded
+
+    def payload(self, text):
+        """The string actually encoded (and captioned) for *text*."""
+        return text.upper() if self.settings.segments == "uppercase" else text
+
+    def encode(self, text, border=4):
+        """Encode *text* at one pixel per module with the settings' profile."""
+        settings = self.settings
+        with self.profile.stage("qr_encode"):
+            qr = qrcode.QRCode(
+                version=1,
+                error_correction=ERROR_CORRECTION,
+                box_size=1,
+                border=border,
+                mask_pattern=ENCODING_PROFILES[settings.encoding],
+            )
+            if settings.segments == "qrcode":
+                qr.add_data(text)
+                qr.make(fit=True)
+            else:
+                qr.version, segments = optimal_segments(self.payload(text), ERROR_CORRECTION)
+                for segment in segments:
+                    qr.add_data(segment)
+                qr.make(fit=False)
+        if self.versions is not None:
+            self.versions[qr.version] += 1
+        return qr
+
+    def version(self, text):
+        """QR version *text* encodes to, without building the symbol."""
+        if self.settings.segments == "qrcode":
+            qr = qrcode.QRCode(error_correction=ERROR_CORRECTION)
+            qr.add_data(text)
+            return qr.best_fit()
+        return optimal_segments(self.payload(text), ERROR_CORRECTION)[0]
+
+    def template(self, target_w, target_h):
+        """The compiled ``LabelTemplate`` for these settings at the target size."""
+        return self.templates.template(
+            self.settings, target_w, target_h,
+            lambda: self._compile_template(target_w, target_h),
+        )
+
+    def _compile_template(self, target_w, target_h):
+        settings = self.settings
+        font_file = FONT_MAP.get(settings.font, "arial.ttf")
+
+        # Proportional scale (defaults calibrated for 1200x600 = 4"x2" @300 DPI)
+        scale = min(target_w / 1200, target_h / 600)
+
+        # Spacing
+        padding = max(1, round(25 * scale))
+        gap = max(1, round(15 * scale))
+        content_w = target_w - 2 * padding
+
+        # --- Logo ---
+        user_logo_w = max(50, min(1000, settings.logo_size))
+        logo_width = max(1, round(user_logo_w * scale))
+        if logo_width > content_w:
+            logo_width = content_w
+        user_text_size = max(6, min(100, settings.text_size))
+        text_font_size = max(6, round(user_text_size * scale))
+        with self.profile.stage("assets"):
+            logo = self.cache.logo(settings.logo_path, logo_width)
+            font = self.cache.font(font_file, text_font_size)
+
+        logo_x = calc_x(settings.logo_align, target_w, logo_width, padding)
+        with self.profile.stage("template"):
+            canvas_mode = "RGB" if settings.color_mode == "RGB" else "L"
+            background = Image.new(canvas_mode, (target_w, target_h), "white")
+            background.paste(logo, (logo_x, padding), logo)
+
+        return LabelTemplate(
+            width=target_w,
+            height=target_h,
+            padding=padding,
+            gap=gap,
+            content_w=content_w,
+            logo=logo,
+            logo_x=logo_x,
+            logo_y=padding,
+            font=font,
+            font_key=(font_file, text_font_size),
+            font_size=getattr(font, "size", text_font_size),
+            qr_y=padding + logo.height + gap,
+            background=background,
+        )
+
+    def layout(self, text, target_w, target_h):
+        """Compute the geometry of a label at exact target dimensions.
+
+        All elements (logo, QR, text, spacing) are sized proportionally to
+        the target canvas.  The QR code is always laid out as a perfect
+        square.  Raster and vector output both draw from this layout.
+        """
+        settings = self.settings
+        text = self.payload(text)
+        template = self.template(target_w, target_h)
+        padding, gap = template.padding, template.gap
+
+        # --- Text ---
+        with self.profile.stage("text_layout"):
+            caption = self.text_layout.layout(
+                text, template.font, template.font_key, template.content_w
+            )
+
+        # --- QR code (always square) ---
+        used_h = template.qr_y + gap + caption.height + padding
+        qr_max_h = max(1, target_h - used_h)
+        qr_size = max(1, min(qr_max_h, template.content_w))
+
+        qr = self.encode(text)
+
+        return LabelLayout(
+            width=target_w,
+            height=target_h,
+            modules=qr.get_matrix(),
+            version=qr.version,
+            qr_x=calc_x(settings.qr_align, target_w, qr_size, padding),
+            qr_y=template.qr_y,
+            qr_size=qr_size,
+            logo=template.logo,
+            logo_x=template.logo_x,
+            logo_y=template.logo_y,
+            lines=list(caption.lines),
+            font=template.font,
+            font_name=settings.font,
+            font_size=template.font_size,
+            line_spacing=caption.line_height,
+            text_x=calc_x(settings.text_align, target_w, caption.width, padding),
+            text_y=template.qr_y + qr_size + gap,
+            template=template,
+        )
+
+    def render(self, text, target_w, target_h):
+        """Build a QR code image at exact target dimensions."""
+        return self.rasterize(self.layout(text, target_w, target_h))
+
+    def render_many(self, texts, target_w, target_h):
+        """Build labels for *texts*, rasterizing their QR codes in batches."""
+        return self.rasterize_many([self.layout(text, target_w, target_h) for text in texts])
+
+    def rasterize(self, layout):
+        """Draw *layout* as an image in the settings' colour mode.
+
+        Non-RGB labels are composed in grayscale and then reduced to 1-bit
+        or a small gray palette.
+        """
+        with self.profile.stage("qr_raster"):
+            qr_img = rasterize(layout.modules, layout.qr_size, self._canvas_mode())
+        return self._compose(layout, qr_img)
+
+    def rasterize_many(self, layouts):
+        """Draw several layouts; same-sized QR codes are rasterized in one batch."""
+        with self.profile.stage("qr_raster"):
+            qr_imgs = self._qr_images(layouts, self._canvas_mode())
+        return [self._compose(layout, qr_img) for layout, qr_img in zip(layouts, qr_imgs)]
+
+    def _canvas_mode(self):
+        return "RGB" if self.settings.color_mode == "RGB" else "L"
+
+    @staticmethod
+    def _qr_images(layouts, mode):
+        """Rasterize the QR codes of *layouts*, grouped by (modules, pixel size)."""
+        groups = defaultdict(list)
+        for i, layout in enumerate(layouts):
+            groups[len(layout.modules), layout.qr_size].append(i)
+
+        images = [None] * len(layouts)
+        for (_, size), indices in groups.items():
+            batch = rasterize_batch([layouts[i].modules for i in indices], size, mode)
+            for i, img in zip(indices, batch):
+                images[i] = img
+        return images
+
+    def _compose(self, layout, qr_img):
+        mode = self.settings.color_mode
+        with self.profile.stage("compose"):
+            # Start from the template's background (canvas with the logo)
+            final_img = layout.template.background.copy()
+
+            # QR code below logo (square)
+            final_img.paste(qr_img, (layout.qr_x, layout.qr_y))
+
+            # Text below QR
+            draw = ImageDraw.Draw(final_img)
+            draw.text(
+                (layout.text_x, layout.text_y), "\n".join(layout.lines),
+                fill="black", font=layout.font, spacing=LINE_SPACING
+            )
+
+            if mode == "1":
+                final_img = final_img.point(lambda v: 255 if v >= MONO_THRESHOLD else 0, "1")
+            elif mode == "P":
+                # Map gray levels straight to palette indices (no quantizer pass)
+                top = PALETTE_COLORS - 1
+                final_img = final_img.point(lambda v: (v * top + 127) // 255)
+                final_img.putpalette(GRAY_PALETTE)
+        return final_img
+
+    def render_code(self, text, box_size=10, border=4):
+        """Build a bare QR code (no logo or caption), as the CLI writes it."""
+        return self.render_codes([text], box_size, border)[0]
+
+    def render_codes(self, texts, box_size=10, border=4):
+        """Build bare 1-bit QR codes for *texts*, batching same-version codes."""
+        return self.rasterize_codes([self.code_layout(text, box_size, border) for text in texts])
+
+    def rasterize_codes(self, layouts):
+        """Draw bare-code layouts (see ``code_layout``) as 1-bit images."""
+        with self.profile.stage("qr_raster"):
+            return self._qr_images(layouts, "1")
+
+    def code_layout(self, text, box_size=10, border=4):
+        """Layout of a bare QR code (no logo or caption), for vector output."""
+        qr = self.encode(text, border)
+        size = (qr.modules_count + 2 * border) * box_size
+        return LabelLayout(
+            width=size, height=size, modules=qr.get_matrix(), version=qr.version,
+            qr_x=0, qr_y=0, qr_size=size,
+        )
@@ -0,0 +1,110 @@
+"""Optimal segmentation of QR payloads into numeric, alphanumeric and byte runs.
+
+``qrcode`` only splits out numeric/alphanumeric runs above a fixed length,
+so mixed payloads such as ``ASSET-000123/https://...`` are mostly written
+in byte mode.  Here the split is found by dynamic programming over the
+payload's UTF-8 bytes, minimising the total bit length (mode headers and
+character-count fields included) for each character-count class, and the
+smallest version that holds the result is chosen.
+"""
+from bisect import bisect_left
+
+from qrcode import exceptions, util
+
+NUMERIC, ALPHANUMERIC, BYTE = range(3)
+MODES = (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE)
+CHAR_COST = (20, 33, 48)  # sixths of a bit per character (10/3, 11/2, 8 bits)
+
+DIGITS = frozenset(b"0123456789")
+ALPHANUMERIC_CHARS = frozenset(util.ALPHA_NUM)
+
+# Versions sharing the same character-count field widths
+VERSION_CLASSES = ((1, 9), (10, 26), (27, 40))
+
+
+def _ceil6(cost):
+    return -(-cost // 6) * 6
+
+
+def split_modes(data, version):
+    """Return the cheapest [(mode index, bytes), ...] split of *data*.
+
+    Costs use the character-count widths of *version*'s class.  Each
+    step keeps the cheapest way to end the prefix in every mode, plus a
+    back-pointer to the mode it continued from.
+    """
+    count_bits = util.mode_sizes_for_version(version)
+    header = [(4 + count_bits[mode]) * 6 for mode in MODES]
+
+    cost = None
+    back = []
+    for b in data:
+        allowed = (b in DIGITS, b in ALPHANUMERIC_CHARS, True)
+        new, step = [None, None, None], [None, None, None]
+        for m in range(3):
+            if not allowed[m]:
+                continue
+            if cost is None:
+                new[m], step[m] = header[m] + CHAR_COST[m], -1
+                continue
+            switch_from = min(
+                (k for k in range(3) if k != m and cost[k] is not None),
+                key=lambda k: cost[k], default=None,
+            )
+            if cost[m] is not None:
+                new[m], step[m] = cost[m] + CHAR_COST[m], m
+            if switch_from is not None:
+                switched = _ceil6(cost[switch_from]) + header[m] + CHAR_COST[m]
+                if new[m] is None or switched < new[m]:
+                    new[m], step[m] = switched, switch_from
+        cost = new
+        back.append(step)
+
+    if cost is None:
+        return [(BYTE, data)]  # empty payload, written as qrcode does
+
+    # Walk the back-pointers from the cheapest final mode
+    mode = min((m for m in range(3) if cost[m] is not None), key=lambda m: _ceil6(cost[m]))
+    modes = [0] * len(data)
+    for i in range(len(data) - 1, -1, -1):
+        modes[i] = mode
+        mode = back[i][mode]
+
+    runs = []
+    start = 0
+    for i in range(1, len(data) + 1):
+        if i == len(data) or modes[i] != modes[start]:
+            runs.append((modes[start], data[start:i]))
+            start = i
+    return runs
+
+
+def segment_bits(runs, version):
+    """Exact number of data bits the runs need at *version*."""
+    count_bits = util.mode_sizes_for_version(version)
+    total = 0
+    for m, chunk in runs:
+        n = len(chunk)
+        if m == NUMERIC:
+            body = 10 * (n // 3) + (0, 4, 7)[n % 3]
+        elif m == ALPHANUMERIC:
+            body = 11 * (n // 2) + 6 * (n % 2)
+        else:
+            body = 8 * n
+        total += 4 + count_bits[MODES[m]] + body
+    return total
+
+
+def optimal_segments(text, error_correction):
+    """Return (version, [QRData, ...]) for the smallest encoding of *text*."""
+    data = text.encode("utf-8")
+    limits = util.BIT_LIMIT_TABLE[error_correction]
+
+    for low, high in VERSION_CLASSES:
+        runs = split_modes(data, low)
+        version = bisect_left(limits, segment_bits(runs, low), low)
+        if version <= high:
+            segments = [util.QRData(chunk, mode=MODES[m], check_data=False)
+                        for m, chunk in runs]
+            return version, segments
+    raise exceptions.DataOverflowError()
@@ -0,0 +1,420 @@
+"""Headless HTTP render service (stdlib only).
+
+Labels are rendered by a pool of worker processes that is started and
+warmed up (fonts, logos and label templates loaded) once, so each request
+pays only for its labels.  Endpoints:
+
+    POST /render   {"text": ..., "width": 4, "height": 2, "unit": "in",
+                    "format": "png", "settings": {"font": "Arial", ...}}
+                   -> the encoded label (PNG, JPEG, SVG or PDF)
+    GET  /render?text=...&width=4&height=2&font=Arial
+                   -> same, with settings as query parameters
+    POST /batch    {"texts": [...], ...same options...} -> ZIP of labels
+    GET  /metrics  -> JSON request counts, latency percentiles, throughput
+    GET  /health   -> {"status": "ok"}
+
+Without width/height the bare QR code is returned, as the CLI writes it.
+Settings use the CLI option names (``logo_align``, ``logo_width``,
+``colors``, ``png_level``, ``encoding``, ``segments``, ...).
+
+    python qr_server.py --port 8765 --workers 4
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from qrcode.exceptions import DataOverflowError
+
+from qr_export import (
+    CHUNK_SIZE, DEFAULT_WORKERS, FORMAT_EXTENSIONS, ZIP_COMPRESSION, deduplicate, encode_batch
+)
+from qr_render import (
+    COLOR_MODES, ENCODING_PROFILES, FONT_MAP, SEGMENT_MODES, LabelRenderer, LabelSettings,
+    target_pixels,
+)
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_CONCURRENT = 8         # requests rendered at once; more wait for a slot
+QUEUE_TIMEOUT = 5.0        # seconds a request waits for a slot before 503
+REQUEST_TIMEOUT = 120.0    # seconds a request may spend rendering before 504
+MAX_BATCH = 5000           # labels per /batch request
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_TARGET_PX = 10000      # longest label side accepted, in pixels
+LATENCY_WINDOW = 1000      # recent requests kept per endpoint for percentiles
+THROUGHPUT_WINDOW = 60.0   # seconds covered by recent_labels_per_sec
+
+CONTENT_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "SVG": "image/svg+xml",
+    "PDF": "application/pdf",
+}
+
+ALIGNMENTS = ("left", "center", "right")
+
+# Request setting -> (LabelSettings field, type, allowed values)
+SETTING_OPTIONS = {
+    "logo_align": ("logo_align", str, ALIGNMENTS),
+    "qr_align": ("qr_align", str, ALIGNMENTS),
+    "text_align": ("text_align", str, ALIGNMENTS),
+    "logo_width": ("logo_size", int, None),
+    "text_size": ("text_size", int, None),
+    "font": ("font", str, FONT_MAP),
+    "colors": ("color_mode", str, COLOR_MODES),
+    "png_level": ("png_compress_level", int, range(10)),
+    "encoding": ("encoding", str, ENCODING_PROFILES),
+    "segments": ("segments", str, SEGMENT_MODES),
+}
+
+
+class RequestError(ValueError):
+    """A client error, answered with *status* and a JSON error message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def settings_from_params(params):
+    """Build ``LabelSettings`` from request settings named like the CLI options."""
+    kwargs = {}
+    for name, value in params.items():
+        if name not in SETTING_OPTIONS:
+            raise RequestError(400, f"unknown setting {name!r}")
+        field, kind, choices = SETTING_OPTIONS[name]
+        try:
+            value = kind(value)
+        except (TypeError, ValueError):
+            raise RequestError(400, f"{name} must be {kind.__name__}")
+        if choices is not None and value not in choices:
+            raise RequestError(400, f"{name} must be one of {', '.join(map(str, choices))}")
+        kwargs[field] = COLOR_MODES[value] if name == "colors" else value
+    return LabelSettings(**kwargs)
+
+
+def parse_job(params, batch):
+    """Validate request parameters into (settings, texts, target_w, target_h, fmt)."""
+    if batch:
+        texts = params.get("texts")
+        if not isinstance(texts, list) or not texts:
+            raise RequestError(400, "texts must be a non-empty list of strings")
+        if len(texts) > MAX_BATCH:
+            raise RequestError(413, f"at most {MAX_BATCH} labels per batch")
+    else:
+        texts = [params.get("text")]
+    if not all(isinstance(text, str) and text for text in texts):
+        raise RequestError(400, "payloads must be non-empty strings")
+
+    fmt = str(params.get("format", "PNG")).upper()
+    if fmt not in FORMAT_EXTENSIONS:
+        raise RequestError(400, f"format must be one of {', '.join(FORMAT_EXTENSIONS)}")
+
+    target_w = target_h = None
+    width, height = params.get("width"), params.get("height")
+    if (width is None) != (height is None):
+        raise RequestError(400, "width and height must be given together")
+    if width is not None:
+        try:
+            target_w, target_h = target_pixels(
+                float(width), float(height), params.get("unit", "in")
+            )
+        except (TypeError, ValueError) as e:
+            raise RequestError(400, str(e) or "width and height must be numbers")
+        if max(target_w, target_h) > MAX_TARGET_PX:
+            raise RequestError(400, f"labels are limited to {MAX_TARGET_PX} px per side")
+
+    settings = params.get("settings", {})
+    if not isinstance(settings, dict):
+        raise RequestError(400, "settings must be an object")
+    return settings_from_params(settings), texts, target_w, target_h, fmt
+
+
+def zip_labels(results, fmt):
+    """Pack encoded labels into a ZIP, named like the GUI export."""
+    ext = FORMAT_EXTENSIONS[fmt][0]
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", ZIP_COMPRESSION[fmt]) as zf:
+        for i, data in enumerate(results):
+            zf.writestr(f"qr_{i + 1:04d}{ext}", data)
+    return buf.getvalue()
+
+
+def _percentile(ordered, pct):
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class ServerMetrics:
+    """Thread-safe request, latency and throughput counters."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = defaultdict(int)
+        self.statuses = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.labels = 0
+        self.bytes_out = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._recent = deque()  # (monotonic time, labels) of recent requests
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record(self, endpoint, status, seconds, labels=0, size=0):
+        now = time.monotonic()
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.statuses[status] += 1
+            self.latencies[endpoint].append(seconds)
+            self.bytes_out += size
+            if labels:
+                self.labels += labels
+                self._recent.append((now, labels))
+            while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def report(self):
+        now = time.monotonic()
+        with self._lock:
+            uptime = now - self.started
+            recent = sum(n for t, n in self._recent if now - t <= THROUGHPUT_WINDOW)
+            latency = {}
+            for endpoint, values in self.latencies.items():
+                ordered = sorted(values)
+                latency[endpoint] = {
+                    "count": len(ordered),
+                    "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+                    "p50": round(_percentile(ordered, 50) * 1000, 3),
+                    "p90": round(_percentile(ordered, 90) * 1000, 3),
+                    "p99": round(_percentile(ordered, 99) * 1000, 3),
+                }
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "requests": dict(self.requests),
+                "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+                "labels": self.labels,
+                "labels_per_sec": round(self.labels / uptime, 2) if uptime > 0 else 0.0,
+                "recent_labels_per_sec": round(recent / min(uptime, THROUGHPUT_WINDOW), 2)
+                if uptime > 0 else 0.0,
+                "bytes_out": self.bytes_out,
+                "latency_ms": latency,
+            }
+
+
+def _warm_worker():
+    """Load every font, the logo and the default templates in a new worker."""
+    target = target_pixels(4, 2, "in")
+    for font in FONT_MAP:
+        LabelRenderer(LabelSettings(font=font)).render("warm-up", *target)
+    LabelRenderer().render_code("warm-up")
+
+
+def _warm_task():
+    return True
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server that owns the warm worker pool and request limits."""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=DEFAULT_WORKERS, max_concurrent=MAX_CONCURRENT,
+                 request_timeout=REQUEST_TIMEOUT, verbose=False):
+        super().__init__(address, RenderHandler)
+        self.workers = workers
+        self.max_concurrent = max_concurrent
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        # Start (and so warm up) every worker before accepting requests
+        for future in [self.pool.submit(_warm_task) for _ in range(workers)]:
+            future.result()
+        self.metrics = ServerMetrics()
+
+    def render(self, settings, texts, target_w, target_h, fmt):
+        """Render *texts* on the pool, in input order (repeats only once)."""
+        deadline = time.monotonic() + self.request_timeout
+        texts, order = deduplicate(texts)
+        futures = [
+            self.pool.submit(encode_batch, settings, texts[i:i + CHUNK_SIZE],
+                             target_w, target_h, fmt)
+            for i in range(0, len(texts), CHUNK_SIZE)
+        ]
+        results = []
+        try:
+            for future in futures:
+                results.extend(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            raise RequestError(504, f"rendering took longer than {self.request_timeout:g}s")
+        return [results[i] for i in order]
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "qrGenerator"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            self._send_json(200, self.server.metrics.report())
+        elif url.path == "/health":
+            self._send_json(200, {"status": "ok", "workers": self.server.workers})
+        elif url.path == "/render":
+            params = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+            job = {key: params.pop(key) for key in
+                   ("text", "width", "height", "unit", "format") if key in params}
+            job["settings"] = params
+            self._render("render", job)
+        else:
+            self._send_json(404, {"error": f"no such endpoint {url.path}"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ("/render", "/batch"):
+            self._send_json(404, {"error": f"no such endpoint {path}"})
+            return
+        endpoint = path[1:]
+        try:
+            params = self._read_json()
+        except RequestError as e:
+            self.server.metrics.record(endpoint, e.status, 0.0)
+            self._send_json(e.status, {"error": str(e)})
+            return
+        self._render(endpoint, params)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise RequestError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"request body is limited to {MAX_BODY_BYTES} bytes")
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise RequestError(400, "request body must be JSON")
+        if not isinstance(params, dict):
+            raise RequestError(400, "request body must be a JSON object")
+        return params
+
+    def _render(self, endpoint, params):
+        server = self.server
+        start = time.perf_counter()
+        if not server.slots.acquire(timeout=QUEUE_TIMEOUT):
+            server.metrics.reject()
+            server.metrics.record(endpoint, 503, time.perf_counter() - start)
+            self._send_json(503, {"error": "server busy"}, {"Retry-After": "1"})
+            return
+
+        server.metrics.begin()
+        labels = 0
+        try:
+            settings, texts, target_w, target_h, fmt = parse_job(params, endpoint == "batch")
+            results = server.render(settings, texts, target_w, target_h, fmt)
+            labels = len(results)
+            if endpoint == "batch":
+                status, content_type, body = 200, "application/zip", zip_labels(results, fmt)
+            else:
+                status, content_type, body = 200, CONTENT_TYPES[fmt], results[0]
+        except RequestError as e:
+            status, content_type, body = e.status, None, {"error": str(e)}
+        # Payloads the render rejects are the client's fault, not the server's
+        except DataOverflowError:
+            status, content_type, body = 400, None, {"error": "payload too long for a QR code"}
+        except UnicodeEncodeError:
+            status, content_type, body = 400, None, {
+                "error": "payloads must be valid Unicode text (no lone surrogates)"
+            }
+        except Exception as e:
+            status, content_type, body = 500, None, {"error": f"rendering failed: {e}"}
+        finally:
+            server.metrics.end()
+            server.slots.release()
+
+        if content_type is None:
+            body = json.dumps(body).encode("utf-8")
+        server.metrics.record(endpoint, status, time.perf_counter() - start, labels, len(body))
+        self._send(status, content_type or "application/json", body)
+
+    def _send_json(self, status, obj, headers=None):
+        self._send(status, "application/json", json.dumps(obj).encode("utf-8"), headers)
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local HTTP QR label render service.")
+    parser.add_argument("--host", default=HOST, help=f"address to bind (default: {HOST})")
+    parser.add_argument("--port", type=int, default=PORT, help=f"port (default: {PORT})")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"render worker processes (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT,
+                        help=f"requests rendered at once (default: {MAX_CONCURRENT})")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help=f"seconds per request before 504 (default: {REQUEST_TIMEOUT:g})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.workers < 1 or args.max_concurrent < 1:
+        print("--workers and --max-concurrent must be at least 1", file=sys.stderr)
+        return 2
+
+    server = RenderServer((args.host, args.port), args.workers, args.max_concurrent,
+                          args.timeout, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"with {args.workers} warm worker(s); Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Deterministic sharding of CLI batch runs, and merging the shards.
+
+``--shard k/n`` makes ``generate_qr_codes`` render every n-th payload of
+the input, starting with the k-th (round-robin by position, so it works
+on streams of unknown length and every agent reading the same input
+picks the same labels).  Files keep their global numbers
+(``qr_0001.png`` ..., as in GUI exports), and each shard leaves a
+manifest of its entries next to them: JSON Lines, a header followed by
+the shard's payloads in order, so it can be read one record at a time.  The merge command combines the
+shards into one export archive without rendering anything:
+
+    python qrGenerator.py -i tags.txt -o out --shard 1/2
+    python qrGenerator.py -i tags.txt -o out --shard 2/2
+    python qr_shard.py labels.zip out
+
+Shards may be rendered on different machines; they are compared by
+``settings_digest``, which counts the logo by its contents.  The merged
+archive carries the same digest as a GUI export with those settings and
+label size, so it can serve as the previous export of an incremental one.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+
+from qr_archive import MANIFEST_VERSION, ArchiveWriter, ExportResult, entry_name
+from qr_cache import cache_key
+from qr_export import FORMAT_EXTENSIONS, ZIP_COMPRESSION
+
+SHARD_MANIFEST = "qr_shard_{}of{}.jsonl"
+_SHARD_MANIFEST = re.compile(r"^qr_shard_(\d+)of(\d+)\.jsonl$")
+
+
+def parse_shard(spec):
+    """Parse ``"k/n"`` (1 <= k <= n) into (k, n)."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if match is None:
+        raise ValueError(f"shard must look like k/n, e.g. 3/8 (got {spec!r})")
+    k, n = int(match.group(1)), int(match.group(2))
+    if not 1 <= k <= n:
+        raise ValueError(f"shard {k}/{n} is out of range (1 <= k <= n)")
+    return k, n
+
+
+def shard_payloads(strings, k, n):
+    """The payloads of shard *k* of *n*: positions k-1, k-1+n, k-1+2n, ..."""
+    for i, text in enumerate(strings):
+        if i % n == k - 1:
+            yield text
+
+
+def global_index(local, k, n):
+    """0-based position in the whole input of the *local*-th label of shard *k*."""
+    return local * n + k - 1
+
+
+class ShardManifest:
+    """The manifest of one shard, written as its labels are.
+
+    Each payload is appended to a journal next to the manifest (one JSON
+    string per line, flushed line by line) as its file is written, and
+    ``finish()`` puts the header in front of it once the shard is
+    complete, so memory does not grow with the shard.  The journal of an
+    interrupted run is kept for ``open(keep)`` to continue.
+    """
+
+    def __init__(self, output_dir, shard, digest, fmt):
+        k, n = shard
+        self.shard = shard
+        self.digest = digest
+        self.fmt = fmt
+        self.path = os.path.join(output_dir, SHARD_MANIFEST.format(k, n))
+        self.journal = f"{self.path}.entries"
+        self.count = 0
+        self._file = None
+
+    def recorded(self):
+        """Number of payloads in the journal left by an interrupted run."""
+        try:
+            with open(self.journal, "rb") as f:
+                return sum(1 for line in f if line.endswith(b"\n"))
+        except FileNotFoundError:
+            return 0
+
+    def open(self, keep=0):
+        """Start journaling after the first *keep* payloads already recorded."""
+        offset = 0
+        if keep:
+            with open(self.journal, "rb") as f:
+                for _ in range(keep):
+                    offset += len(f.readline())
+        with open(self.journal, "ab") as f:
+            f.truncate(offset)
+        self._file = open(self.journal, "a", encoding="utf-8", buffering=1)
+        self.count = keep
+
+    def add(self, text):
+        self._file.write(json.dumps(text) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """Write the manifest of the complete shard and drop the journal."""
+        self.close()
+        header = {"version": MANIFEST_VERSION, "digest": self.digest, "format": self.fmt,
+                  "shard": list(self.shard), "labels": self.count}
+        tmp = f"{self.path}.tmp"
+        with open(self.journal, "rb") as journal, open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            shutil.copyfileobj(journal, f)
+        os.replace(tmp, self.path)
+        os.remove(self.journal)
+        return self.path
+
+
+def find_shard_manifests(paths):
+    """Shard manifests in *paths* (directories are searched, files taken as is)."""
+    manifests = []
+    for path in paths:
+        if os.path.isdir(path):
+            for candidate in sorted(glob.glob(os.path.join(path, "qr_shard_*of*.jsonl"))):
+                if _SHARD_MANIFEST.match(os.path.basename(candidate)):
+                    manifests.append(candidate)
+        else:
+            manifests.append(path)
+    return manifests
+
+
+def read_shard_header(f):
+    """The header of the shard manifest open as *f*, leaving *f* at its first payload."""
+    header = json.loads(f.readline())
+    if not isinstance(header, dict) or "shard" not in header:
+        raise ValueError(f"{f.name} is not a shard manifest")
+    return header
+
+
+def merge_shards(paths, zip_path, max_bytes=None, max_labels=None):
+    """Combine the shards in *paths* into the export archive *zip_path*.
+
+    Every shard k/n must be present exactly once and all of them must
+    have been rendered with the same settings and format (checked from
+    the manifest headers).  Files are written in global order under their
+    own names, with an archive manifest as in GUI exports; repeats across
+    shards are stored once and copied.  The shard manifests are read in
+    lockstep, one payload at a time.  Returns an ``ExportResult``.
+    """
+    with contextlib.ExitStack() as stack:
+        shards = {}
+        for path in find_shard_manifests(paths):
+            f = stack.enter_context(open(path, encoding="utf-8"))
+            header = read_shard_header(f)
+            k, n = header["shard"]
+            if k in shards:
+                raise ValueError(f"shard {k}/{n} is given twice")
+            shards[k] = (os.path.dirname(path), header, f)
+        if not shards:
+            raise ValueError("no shard manifests found")
+
+        first = next(iter(shards.values()))[1]
+        n = first["shard"][1]
+        for _, header, _ in shards.values():
+            if header["shard"][1] != n:
+                raise ValueError("the shards come from runs split into different numbers "
+                                 "of shards")
+            if (header["digest"], header["format"]) != (first["digest"], first["format"]):
+                raise ValueError("the shards were rendered with different settings or formats")
+        missing = sorted(set(range(1, n + 1)) - set(shards))
+        if missing:
+            raise ValueError(f"missing shard(s) {', '.join(f'{k}/{n}' for k in missing)}")
+
+        # Round-robin: shard k holds positions k-1, k-1+n, ..., so the counts fix the total
+        total = sum(header["labels"] for _, header, _ in shards.values())
+        for k, (_, header, _) in shards.items():
+            expected = len(range(k - 1, total, n))
+            if header["labels"] != expected:
+                raise ValueError(f"shard {k}/{n} has {header['labels']} labels, "
+                                 f"expected {expected} of {total}")
+
+        fmt, digest = first["format"], first["digest"]
+        ext = FORMAT_EXTENSIONS[fmt][0]
+        archive = ArchiveWriter(
+            zip_path, ZIP_COMPRESSION[fmt],
+            {"version": MANIFEST_VERSION, "digest": digest, "format": fmt},
+            max_bytes=max_bytes, max_labels=max_labels,
+        )
+        result = ExportResult()
+        try:
+            for i in range(total):
+                k = i % n + 1
+                dirname, _, f = shards[k]
+                line = f.readline()
+                if not line.endswith("\n"):
+                    raise ValueError(f"the manifest of shard {k}/{n} is truncated")
+                text = json.loads(line)
+                name = entry_name(i, ext)
+                key = cache_key(text, digest)
+                if key in archive:
+                    info = archive.repeat(name, key, text)
+                    result.repeats += 1
+                else:
+                    path = os.path.join(dirname, name)
+                    with open(path, "rb") as src:
+                        info = archive.write(name, key, text,
+                                             lambda fp: shutil.copyfileobj(src, fp),
+                                             os.path.getsize(path))
+                    result.copied += 1
+                result.bytes += info.file_size
+                result.labels += 1
+            archive.close()
+        except BaseException:
+            archive.abort()
+            raise
+    result.paths = archive.paths
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Merge the outputs of a sharded qrGenerator.py run (--shard k/n) into "
+                    "one export ZIP, without re-rendering."
+    )
+    parser.add_argument("zip", help="archive to write")
+    parser.add_argument("shards", nargs="+",
+                        help="shard output directories or qr_shard_KofN.jsonl manifests")
+    parser.add_argument("--split-mb", type=int, metavar="MB",
+                        help="start a new numbered volume before one would exceed MB")
+    parser.add_argument("--labels-per-zip", type=int, metavar="N",
+                        help="start a new numbered volume after N labels")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    max_bytes = args.split_mb * 2**20 if args.split_mb else None
+    try:
+        result = merge_shards(args.shards, args.zip, max_bytes, args.labels_per_zip or None)
+    except (OSError, KeyError, ValueError) as e:
+        parser.error(str(e))
+    print(f"Merged {result.labels} labels ({result.bytes / 2**20:.1f} MB) into "
+          f"{', '.join(result.paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
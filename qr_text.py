@@ -0,0 +1,146 @@
+"""Caption layout from measured glyph advances.
+
+``TextLayoutCache`` wraps captions on their real pixel width: every font
+(keyed by file and size) gets a lazily filled table of glyph advances, so
+a candidate line is measured by summing table entries rather than by
+asking the font again.  Finished layouts are memoized per (font, text,
+width), which makes repeated captions free.  Bounding boxes come from the
+font directly; no scratch image or ``ImageDraw`` is needed.
+"""
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+TEXT_LAYOUT_CACHE_SIZE = 4096
+LINE_SPACING = 4  # extra pixels between caption lines (Pillow's default)
+
+_TOKENS = re.compile(r"\s+|\S+")
+
+
+@dataclass(frozen=True)
+class TextBlock:
+    """Wrapped caption lines and their bounding box when drawn at (0, 0).
+
+    ``bbox`` matches ``ImageDraw.multiline_textbbox`` with the same font
+    and ``LINE_SPACING``; ``line_height`` is the distance between baselines.
+    """
+    lines: tuple
+    bbox: tuple
+    line_height: int
+
+    @property
+    def width(self):
+        return self.bbox[2] - self.bbox[0]
+
+    @property
+    def height(self):
+        return self.bbox[3] - self.bbox[1]
+
+
+class GlyphAdvances:
+    """Advance widths of one font, measured once per character."""
+
+    def __init__(self, font):
+        self.font = font
+        self._advances = {}
+
+    def __getitem__(self, char):
+        advance = self._advances.get(char)
+        if advance is None:
+            advance = self._advances[char] = self.font.getlength(char)
+        return advance
+
+    def width(self, text):
+        return sum(self[char] for char in text)
+
+
+class TextLayoutCache:
+    """Per-font advance tables plus a bounded LRU of finished layouts."""
+
+    def __init__(self, max_entries=TEXT_LAYOUT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._advances = {}
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def advances(self, font_key, font):
+        with self._lock:
+            table = self._advances.get(font_key)
+            if table is None or table.font is not font:
+                table = self._advances[font_key] = GlyphAdvances(font)
+            return table
+
+    def layout(self, text, font, font_key, max_width):
+        """Wrap *text* to *max_width* pixels and measure the result."""
+        key = (font_key, text, max_width)
+        with self._lock:
+            block = self._layouts.get(key)
+            if block is not None:
+                self._layouts.move_to_end(key)
+                return block
+
+        lines = wrap(text, self.advances(font_key, font), max_width)
+        block = TextBlock(tuple(lines), _bbox(lines, font), line_height(font))
+
+        with self._lock:
+            self._layouts[key] = block
+            while len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        return block
+
+
+def line_height(font):
+    """Baseline-to-baseline distance Pillow uses for multi-line text."""
+    return font.getbbox("A")[3] + LINE_SPACING
+
+
+def wrap(text, advances, max_width):
+    """Greedy word wrap on measured widths.
+
+    Like ``textwrap``, runs of whitespace are kept inside a line but
+    dropped at line breaks, and words wider than a line are split.
+    """
+    lines = []
+    line, line_w = "", 0.0
+    for token in _TOKENS.findall(text):
+        if lines and not line and token.isspace():
+            continue  # no leading whitespace on continuation lines
+        token_w = advances.width(token)
+        if line_w + token_w <= max_width:
+            line, line_w = line + token, line_w + token_w
+            continue
+        if token.isspace():
+            lines.append(line)
+            line, line_w = "", 0.0
+            continue
+        if line:
+            lines.append(line.rstrip())
+            line, line_w = "", 0.0
+        # Break words that are wider than a whole line
+        for char in token:
+            char_w = advances[char]
+            if line and line_w + char_w > max_width:
+                lines.append(line)
+                line, line_w = "", 0.0
+            line, line_w = line + char, line_w + char_w
+    if line.strip():
+        lines.append(line.rstrip())
+    return [line for line in lines if line]
+
+
+def _bbox(lines, font):
+    """Union of the per-line boxes, offset by the line height."""
+    if not lines:
+        return (0, 0, 0, 0)
+    step = line_height(font)
+    boxes = [font.getbbox(line) for line in lines]
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] + i * step for i, box in enumerate(boxes)),
+        max(box[2] for box in boxes),
+        max(box[3] + i * step for i, box in enumerate(boxes)),
+    )
+
+
+TEXT_LAYOUT = TextLayoutCache()
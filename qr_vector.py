@@ -0,0 +1,200 @@
+"""SVG and PDF output for labels.
+
+Both writers draw from the same ``LabelLayout`` as the raster path, so
+alignment, padding and gap scaling match ``LabelRenderer.render``.  The QR
+modules become a single path of merged horizontal runs, the logo is
+embedded once as an image, and the caption is emitted as real text.
+
+PDF captions use the standard Type 1 fonts every viewer ships with, so
+nothing is embedded: Arial and Verdana are set in Helvetica and Times New
+Roman in Times-Roman (``PDF_FONTS``).  Verdana is wider than Helvetica, so
+its lines keep their wrap points but run shorter than in the raster label.
+"""
+import base64
+import io
+import zlib
+from xml.sax.saxutils import escape
+
+from qr_render import OUTPUT_DPI
+
+# Standard PDF fonts substituted for the label fonts (see the module docstring)
+PDF_FONTS = {
+    "Arial": "Helvetica",
+    "Times New Roman": "Times-Roman",
+    "Verdana": "Helvetica",
+}
+SVG_GENERIC_FAMILIES = {
+    "Times New Roman": "serif",
+}
+
+
+def module_runs(modules):
+    """Yield (x, y, length) for every horizontal run of dark modules."""
+    for y, row in enumerate(modules):
+        x = 0
+        n = len(row)
+        while x < n:
+            if row[x]:
+                start = x
+                while x < n and row[x]:
+                    x += 1
+                yield start, y, x - start
+            else:
+                x += 1
+
+
+def _logo_png(logo):
+    buf = io.BytesIO()
+    logo.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _baselines(layout):
+    """Yield (line, baseline_y) for each caption line, as Pillow places them."""
+    ascent = layout.font.getmetrics()[0] if layout.font is not None else layout.font_size
+    for i, line in enumerate(layout.lines):
+        yield line, layout.text_y + ascent + i * layout.line_spacing
+
+
+def render_svg(layout, dpi=OUTPUT_DPI):
+    """Return *layout* as an SVG document (bytes).
+
+    User units are output pixels; the physical size is set from *dpi* so
+    printers reproduce the label at the same size as the raster output.
+    """
+    w, h = layout.width, layout.height
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{w / dpi:.4f}in" height="{h / dpi:.4f}in" viewBox="0 0 {w} {h}">\n',
+        f'<rect width="{w}" height="{h}" fill="#fff"/>\n',
+    ]
+
+    if layout.logo is not None:
+        # SVG 2 href for current renderers, xlink:href for SVG 1.1 tools
+        data = base64.b64encode(_logo_png(layout.logo)).decode("ascii")
+        href = f"data:image/png;base64,{data}"
+        parts.append(
+            f'<image x="{layout.logo_x}" y="{layout.logo_y}" '
+            f'width="{layout.logo.width}" height="{layout.logo.height}" '
+            f'href="{href}" xlink:href="{href}"/>\n'
+        )
+
+    module = layout.qr_size / len(layout.modules)
+    d = "".join(f"M{x} {y}h{n}v1h-{n}z" for x, y, n in module_runs(layout.modules))
+    parts.append(
+        f'<path transform="translate({layout.qr_x} {layout.qr_y}) scale({module:.6f})" '
+        f'shape-rendering="crispEdges" fill="#000" d="{d}"/>\n'
+    )
+
+    if layout.lines:
+        generic = SVG_GENERIC_FAMILIES.get(layout.font_name, "sans-serif")
+        parts.append(
+            f'<g font-family="{escape(layout.font_name)}, {generic}" '
+            f'font-size="{layout.font_size}" fill="#000">\n'
+        )
+        for line, baseline in _baselines(layout):
+            parts.append(
+                f'<text x="{layout.text_x}" y="{baseline}" xml:space="preserve">'
+                f'{escape(line)}</text>\n'
+            )
+        parts.append("</g>\n")
+
+    parts.append("</svg>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def _pdf_string(text):
+    """Encode *text* as a PDF literal string in WinAnsi (Latin-1) encoding."""
+    raw = text.encode("cp1252", errors="replace")
+    raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + raw + b")"
+
+
+def render_pdf(layout, dpi=OUTPUT_DPI):
+    """Return *layout* as a single-page vector PDF (bytes).
+
+    The caption is set in the standard font ``PDF_FONTS`` maps the label
+    font to; Verdana falls back to Helvetica.
+    """
+    s = 72 / dpi  # output pixels -> PDF points
+    page_w, page_h = layout.width * s, layout.height * s
+
+    # Content stream, with pixel coordinates flipped to PDF's bottom-up axis
+    ops = [b"1 g 0 0 %.3f %.3f re f" % (page_w, page_h)]
+
+    module = layout.qr_size / len(layout.modules)
+    ops.append(
+        b"q %.6f 0 0 %.6f %.3f %.3f cm 0 g"
+        % (module * s, -module * s, layout.qr_x * s, page_h - layout.qr_y * s)
+    )
+    ops.extend(b"%d %d %d 1 re" % (x, y, n) for x, y, n in module_runs(layout.modules))
+    ops.append(b"f Q")
+
+    if layout.logo is not None:
+        lw, lh = layout.logo.width * s, layout.logo.height * s
+        ops.append(
+            b"q %.3f 0 0 %.3f %.3f %.3f cm /Im1 Do Q"
+            % (lw, lh, layout.logo_x * s, page_h - layout.logo_y * s - lh)
+        )
+
+    if layout.lines:
+        ops.append(b"BT /F1 %.3f Tf 0 g" % (layout.font_size * s))
+        for line, baseline in _baselines(layout):
+            ops.append(
+                b"1 0 0 1 %.3f %.3f Tm %s Tj"
+                % (layout.text_x * s, page_h - baseline * s, _pdf_string(line))
+            )
+        ops.append(b"ET")
+
+    content = zlib.compress(b"\n".join(ops))
+
+    resources = b""
+    if layout.logo is not None:
+        resources += b"/XObject << /Im1 6 0 R >> "
+    if layout.lines:
+        resources += b"/Font << /F1 5 0 R >> "
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.3f %.3f] "
+        b"/Resources << %s>> /Contents 4 0 R >>" % (page_w, page_h, resources),
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+        % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+        % PDF_FONTS.get(layout.font_name, "Helvetica").encode("ascii"),
+    ]
+
+    if layout.logo is not None:
+        # The logo always sits on the white background, so flatten its alpha
+        logo = layout.logo
+        flat = logo.convert("RGB")
+        flat.paste((255, 255, 255), (0, 0, logo.width, logo.height))
+        flat.paste(logo, (0, 0), logo)
+        pixels = zlib.compress(flat.tobytes())
+        objects.append(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+            b"/Length %d >>\nstream\n%s\nendstream"
+            % (logo.width, logo.height, len(pixels), pixels)
+        )
+    else:
+        objects.append(b"null")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    return out.getvalue()